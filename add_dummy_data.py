@@ -1,4 +1,4 @@
-from app import create_app, db
+from app import create_app, db, metrics
 from app.models import MembershipPlan, Trainer, WorkoutPlan, Member, User
 from datetime import date, timedelta
 
@@ -62,4 +62,8 @@ with app.app_context():
     else:
         print("Members and Users already exist.")
 
+    # The dashboard reads running counters (app.metrics), which the inserts above bypass
+    metrics.rebuild()
+    print("Rebuilt dashboard counters.")
+
 print("Dummy data addition process complete.")
@@ -3,7 +3,8 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
-from config import Config
+from config import configs
+from app.cache import TTLCache
 import os
 
 db = SQLAlchemy()
@@ -11,9 +12,9 @@ migrate = Migrate()
 login_manager = LoginManager()
 bcrypt = Bcrypt()
 
-def create_app(config_class=Config):
+def create_app(config_class=None):
     app = Flask(__name__)
-    app.config.from_object(config_class)
+    app.config.from_object(config_class or configs[os.environ.get('FLASK_CONFIG', 'development')])
 
     try:
         os.makedirs(app.instance_path)
@@ -21,20 +22,38 @@ def create_app(config_class=Config):
         pass
 
     db.init_app(app)
+    from app import database, sql_profiler
+    database.init_app(app)
+    sql_profiler.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     bcrypt.init_app(app)
 
+    # Per-app so that several apps in one process (e.g. the CLI checks)
+    # never see each other's entries
+    from app.choices import ChoiceCache
+    app.extensions['dashboard_cache'] = TTLCache(ttl=app.config['DASHBOARD_CACHE_TTL'], maxsize=4)
+    app.extensions['choice_cache'] = ChoiceCache(
+        app.config.get('CHOICES_VERSION_FILE') or os.path.join(app.instance_path, 'choices.version'),
+        max_age=app.config['CHOICES_CACHE_MAX_AGE'])
+
+    from app import attendance_analytics, attendance_buffer, passwords, user_cache, utilization
+    attendance_analytics.init_app(app)
+    utilization.init_app(app)
+    attendance_buffer.init_app(app)
+    user_cache.init_app(app)
+    passwords.init_app(app)
+
     login_manager.login_view = 'main.login'
     login_manager.login_message_category = 'info'
 
     from app import routes
     app.register_blueprint(routes.bp)
 
-    from app.models import User
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    from app import cli
+    cli.init_app(app)
+
+    login_manager.user_loader(user_cache.load_user)
 
     # Error handlers
     @app.errorhandler(403)
@@ -0,0 +1,253 @@
+"""Peak-hour analytics over the attendance table, computed with NumPy.
+
+For each day, check-ins are read as two integer columns (check-in and
+check-out, in epoch seconds) in chunks of ``ATTENDANCE_ANALYTICS_CHUNK_SIZE``
+rows and reduced with array operations into a small per-day summary:
+
+* check-ins per hour,
+* the summed duration and number of timed visits per check-in hour,
+* person-minutes on the floor per hour, and the peak headcount per hour.
+
+Occupancy comes from a per-minute difference array (+1 at arrival, -1 at
+departure) and a cumulative sum, so no row is ever looked at in Python.
+Visits without a check-out, or longer than ``ATTENDANCE_MAX_VISIT_MINUTES``
+(a forgotten check-out), count as ``ATTENDANCE_DEFAULT_VISIT_MINUTES`` for
+occupancy and are left out of the average duration. Visits are cut off at
+midnight.
+
+The summary of each past day is cached per process (``analytics_cache``), so
+a report over a year reads only the days it has not seen yet, and summing
+365 cached summaries is instant. Today is always read fresh. Whatever writes
+attendance for an earlier day (a back-dated check-in, a buffered row flushed
+late, a check-out, an import) calls ``forget`` or ``clear`` after its commit.
+That replaces a version stamp file (``ATTENDANCE_ANALYTICS_VERSION_FILE``),
+and every worker on the host empties its copy on its next report, as the
+user cache does.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from itertools import chain
+
+import numpy as np
+from flask import current_app
+
+from app import db
+from app.attendance_buffer import flush_pending
+from app.cache import TTLCache, VersionStamp
+from app.models import Attendance
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Rows of a day's summary; each row has one value per hour of the day
+CHECKINS, VISIT_MINUTES, TIMED_VISITS, PERSON_MINUTES, PEAK = range(5)
+
+# Days read by one query: bounds the per-minute occupancy array
+WINDOW_DAYS = 31
+
+_EPOCH = datetime(1970, 1, 1)
+_attendance = Attendance.__table__
+
+
+class DayCache:
+    """Summaries of past days, shared by the reports of one process."""
+
+    def __init__(self, version_file, ttl=6 * 3600, maxsize=800):
+        self.days = TTLCache(ttl=ttl, maxsize=maxsize)
+        self.stamp = VersionStamp(version_file)
+        self._version = self.stamp.read()
+        self._lock = threading.Lock()
+
+    def version(self):
+        """Start over if another process changed a past day; return the stamp to pass to ``set``."""
+        version = self.stamp.read()
+        if version != self._version:
+            with self._lock:
+                self.days.clear()
+                self._version = version
+        return version
+
+    def get(self, day):
+        return self.days.get(day)
+
+    def set(self, day, summary, version):
+        # A day read before a write that has since committed would be stale
+        if self.stamp.read() == version:
+            self.days.set(day, summary)
+
+    def forget(self, days):
+        for day in days:
+            self.days.delete(day)
+        self.stamp.bump()
+        self._version = self.stamp.read()
+
+    def clear(self):
+        self.days.clear()
+        self.stamp.bump()
+        self._version = self.stamp.read()
+
+    def stats(self):
+        return self.days.stats()
+
+
+def _epoch_seconds(column):
+    if db.engine.dialect.name == 'sqlite':
+        if db.engine.dialect.dbapi.sqlite_version_info >= (3, 38):
+            return db.func.unixepoch(column)
+        return db.cast(db.func.strftime('%s', column), db.Integer)
+    return db.cast(db.func.extract('epoch', column), db.BigInteger)
+
+
+def _read(first_day, days, chunk_size):
+    """Yield ``(check_in, check_out)`` int64 arrays for ``days`` days from ``first_day``.
+
+    A missing check-out is -1.
+    """
+    start = datetime.combine(first_day, datetime.min.time())
+    statement = (
+        db.select(_epoch_seconds(_attendance.c.check_in_time),
+                  db.func.coalesce(_epoch_seconds(_attendance.c.check_out_time), -1))
+        .where(_attendance.c.check_in_time >= start, _attendance.c.check_in_time < start + timedelta(days=days))
+    )
+    # Streamed with yield_per, like the exports, and through the engine so
+    # the SQL instrumentation and the route checks see the query
+    result = db.session.execute(statement, execution_options={'yield_per': chunk_size})
+    for rows in result.tuples().partitions():
+        values = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows))
+        yield values[0::2], values[1::2]
+
+
+def _summarize(first_day, days, config):
+    """Return a ``(days, 5, 24)`` array: the summary of each day in the window."""
+    origin = int((datetime.combine(first_day, datetime.min.time()) - _EPOCH).total_seconds())
+    checkins = np.zeros(days * 24, dtype=np.int64)
+    visit_minutes = np.zeros(days * 24)
+    timed_visits = np.zeros(days * 24, dtype=np.int64)
+    # One extra slot per day takes departures at or after midnight
+    arrivals_less_departures = np.zeros(days * 1441, dtype=np.int64)
+
+    for check_in, check_out in _read(first_day, days, config['ATTENDANCE_ANALYTICS_CHUNK_SIZE']):
+        offset = check_in - origin
+        day, second = offset // 86400, offset % 86400
+        minute = second // 60
+        slot = day * 24 + minute // 60
+        duration = (check_out - check_in) / 60
+        timed = (check_out >= 0) & (duration >= 0) & (duration <= config['ATTENDANCE_MAX_VISIT_MINUTES'])
+
+        checkins += np.bincount(slot, minlength=days * 24)
+        visit_minutes += np.bincount(slot[timed], weights=duration[timed], minlength=days * 24)
+        timed_visits += np.bincount(slot[timed], minlength=days * 24)
+
+        stay = np.where(timed, np.ceil(duration), config['ATTENDANCE_DEFAULT_VISIT_MINUTES']).astype(np.int64)
+        leave = np.minimum(minute + stay, 1440)
+        arrivals_less_departures += np.bincount(day * 1441 + minute, minlength=days * 1441)
+        arrivals_less_departures -= np.bincount(day * 1441 + leave, minlength=days * 1441)
+
+    occupancy = np.cumsum(arrivals_less_departures.reshape(days, 1441)[:, :1440], axis=1).reshape(days, 24, 60)
+    summary = np.empty((days, 5, 24))
+    summary[:, CHECKINS] = checkins.reshape(days, 24)
+    summary[:, VISIT_MINUTES] = visit_minutes.reshape(days, 24)
+    summary[:, TIMED_VISITS] = timed_visits.reshape(days, 24)
+    summary[:, PERSON_MINUTES] = occupancy.sum(axis=2)
+    summary[:, PEAK] = occupancy.max(axis=2)
+    return summary
+
+
+def _day_summaries(start, end, today):
+    """Return ``{day: (5, 24) array}`` for every day from ``start`` to ``end``."""
+    config = current_app.config
+    cache = current_app.extensions['analytics_cache']
+    version = cache.version()
+    summaries, missing = {}, []
+    day = start
+    while day <= end:
+        summary = cache.get(day) if day < today else None
+        if summary is None:
+            missing.append(day)
+        else:
+            summaries[day] = summary
+        day += timedelta(days=1)
+
+    if today in missing:
+        flush_pending()
+    # Read consecutive missing days together, a window at a time
+    while missing:
+        first_day, days = missing[0], 1
+        while (days < min(len(missing), WINDOW_DAYS)
+               and missing[days] == first_day + timedelta(days=days)):
+            days += 1
+        for index, summary in enumerate(_summarize(first_day, days, config)):
+            day = first_day + timedelta(days=index)
+            summaries[day] = summary
+            if day < today:
+                cache.set(day, summary, version)
+        missing = missing[days:]
+    return summaries
+
+
+def _rounded(array, places=1):
+    return [[round(float(value), places) for value in row] for row in array]
+
+
+def analyze(start, end, today=None):
+    """Hour-of-week attendance figures for the days ``start`` to ``end`` (inclusive).
+
+    Grids are seven rows (Monday first) of 24 hourly values.
+    """
+    today = today or datetime.utcnow().date()
+    summaries = _day_summaries(start, end, today)
+
+    by_weekday = np.zeros((7, 5, 24))
+    peak = np.zeros((7, 24))
+    weekdays = np.zeros(7, dtype=np.int64)
+    for day, summary in summaries.items():
+        weekday = day.weekday()
+        by_weekday[weekday] += summary
+        peak[weekday] = np.maximum(peak[weekday], summary[PEAK])
+        weekdays[weekday] += 1
+
+    # Average headcount over each hour of each weekday in the range
+    occupancy = by_weekday[:, PERSON_MINUTES] / (60 * np.maximum(weekdays, 1))[:, None]
+    timed = by_weekday[:, TIMED_VISITS].sum(axis=0)
+    minutes = by_weekday[:, VISIT_MINUTES].sum(axis=0)
+    busiest = np.argsort(occupancy, axis=None)[::-1][:5]
+
+    return {
+        'start': start.isoformat(), 'end': end.isoformat(), 'days': len(summaries),
+        'weekdays': list(WEEKDAYS),
+        'checkins': by_weekday[:, CHECKINS].astype(int).tolist(),
+        'total_checkins': int(by_weekday[:, CHECKINS].sum()),
+        'average_visit_minutes': round(float(minutes.sum() / timed.sum()), 1) if timed.sum() else None,
+        'average_visit_minutes_by_hour': [round(float(m / t), 1) if t else None for m, t in zip(minutes, timed)],
+        'average_occupancy': _rounded(occupancy),
+        'peak_occupancy': peak.astype(int).tolist(),
+        'peak_hours': [
+            {'weekday': WEEKDAYS[index // 24], 'hour': int(index % 24),
+             'average_occupancy': round(float(occupancy.flat[index]), 1)}
+            for index in busiest if occupancy.flat[index] > 0
+        ],
+    }
+
+
+def forget(*days):
+    """Drop ``days`` from every worker's cache after a commit changed their visits.
+
+    Days from today on are never cached, so writes for them cost nothing.
+    """
+    today = datetime.utcnow().date()
+    past = {day for day in days if day < today}
+    if past:
+        current_app.extensions['analytics_cache'].forget(past)
+
+
+def clear():
+    """Empty every worker's cache, e.g. after an import."""
+    current_app.extensions['analytics_cache'].clear()
+
+
+def init_app(app):
+    app.extensions['analytics_cache'] = DayCache(
+        app.config.get('ATTENDANCE_ANALYTICS_VERSION_FILE') or os.path.join(app.instance_path, 'analytics.version'),
+        ttl=app.config['ATTENDANCE_ANALYTICS_CACHE_TTL'],
+        maxsize=app.config['ATTENDANCE_ANALYTICS_CACHE_DAYS'],
+    )
@@ -0,0 +1,274 @@
+"""Optional write-behind buffer for check-ins (``ATTENDANCE_BUFFER_ENABLED``).
+
+When enabled, check-ins from the check-in form and the kiosk API are
+appended to a bounded in-process queue instead of each being committed on
+its own. A background thread writes the queue in one transaction whenever
+``ATTENDANCE_BUFFER_FLUSH_ROWS`` rows are waiting or every
+``ATTENDANCE_BUFFER_FLUSH_INTERVAL`` seconds. On SQLite that turns hundreds
+of write transactions (and fsyncs) into one, and readers wait on the write
+lock far less often.
+
+Pages that read attendance call ``flush_pending()`` first, which writes out
+this process's queue only. Each worker has its own queue, so with several
+workers a page can miss check-ins queued in another one until its flusher
+runs: for up to ``ATTENDANCE_BUFFER_FLUSH_INTERVAL`` seconds. That applies
+to the attendance list, the dashboard's check-in count and workouts goal
+progress alike. When the queue is full, ``append`` flushes in the caller's
+thread instead of dropping rows.
+
+``ATTENDANCE_BUFFER_DURABILITY`` controls what survives a crash before a flush:
+
+* ``memory``: nothing; queued rows die with the process.
+* ``journal``: every row is appended to a per-process journal file before it
+  is acknowledged. This survives a worker crash but not a power cut.
+* ``fsync``: the journal is also fsynced on every append. This survives a
+  power cut.
+
+A worker replays journals left behind by dead processes when it starts, and
+deletes them only once the rows are in its own journal. Every buffered row carries an idempotency key, so a row that reached the
+database just before the crash is not inserted twice.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from flask import current_app
+
+from app import db, metrics, workout_goals
+from app.models import Attendance
+
+DURABILITY_LEVELS = ('memory', 'journal', 'fsync')
+
+
+def _encode(row):
+    return json.dumps({**row, 'check_in_time': row['check_in_time'].isoformat()}) + '\n'
+
+
+def _decode(line):
+    row = json.loads(line)
+    row['check_in_time'] = datetime.fromisoformat(row['check_in_time'])
+    return row
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Alive, owned by another user
+    return True
+
+
+class AttendanceBuffer:
+    def __init__(self, app, max_rows=10000, flush_rows=500, flush_interval=1.0,
+                 durability='journal', journal_dir=None):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f'ATTENDANCE_BUFFER_DURABILITY must be one of {", ".join(DURABILITY_LEVELS)}')
+        self.app = app
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.journal_dir = journal_dir
+        self._rows = []
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._journal = None
+        self._pid = None
+
+    # --- Queue ---
+
+    def append(self, member_id, check_in_time, idempotency_key=None):
+        """Queue a check-in; return False if its idempotency key is already queued."""
+        row = {'member_id': member_id, 'check_in_time': check_in_time,
+               'idempotency_key': idempotency_key or uuid.uuid4().hex}
+        while True:
+            with self._lock:
+                self._start()
+                if row['idempotency_key'] in self._keys:
+                    return False
+                if len(self._rows) < self.max_rows:
+                    self._rows.append(row)
+                    self._keys[row['idempotency_key']] = member_id
+                    self._write_journal([row])
+                    if len(self._rows) >= self.flush_rows:
+                        self._wakeup.set()
+                    return True
+            # Full: write the backlog ourselves rather than drop the check-in
+            self.flush()
+
+    def queued_member(self, idempotency_key):
+        """Return the member id of a queued check-in with this key, if any."""
+        with self._lock:
+            return self._keys.get(idempotency_key)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def flush(self):
+        """Write every queued row in one transaction and return how many were new."""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._rows)
+            if not rows:
+                return 0
+
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    table = Attendance.__table__
+                    stored = set(connection.scalars(
+                        db.select(table.c.idempotency_key)
+                        .where(table.c.idempotency_key.in_([row['idempotency_key'] for row in rows]))))
+                    new_rows = [row for row in rows if row['idempotency_key'] not in stored]
+                    if new_rows:
+                        connection.execute(table.insert(), new_rows)
+                        metrics.add(connection, 'total_checkins', len(new_rows))
+                        workout_goals.advance(connection)
+                if new_rows:
+                    # Imported here: attendance_analytics imports this module
+                    from app import attendance_analytics
+                    attendance_analytics.forget(*{row['check_in_time'].date() for row in new_rows})
+
+            with self._lock:
+                # Rows queued while we were writing stay behind for the next flush
+                del self._rows[:len(rows)]
+                for row in rows:
+                    self._keys.pop(row['idempotency_key'], None)
+                self._rewrite_journal()
+            return len(new_rows)
+
+    # --- Background flusher ---
+
+    def _start(self):
+        """Start the flusher once per process (call with ``_lock`` held).
+
+        Threads do not survive a fork, so a pre-forking server gets one
+        flusher (and one journal) per worker, started on first use.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._rows, self._keys, self._journal = [], {}, None
+        if self.durability != 'memory':
+            os.makedirs(self.journal_dir, exist_ok=True)
+            recovered, claimed = self._recover_orphans()
+            self._journal = open(self._journal_path(self._pid), 'a', encoding='utf-8')
+            self._write_journal(recovered)
+            # Only now that our own journal holds the rows can theirs go
+            for path in claimed:
+                os.remove(path)
+            if recovered:
+                self._wakeup.set()
+        threading.Thread(target=self._run, name='attendance-flusher', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Rows stay queued (and journaled); the next tick retries
+                self.app.logger.exception('Could not flush buffered check-ins')
+
+    # --- Journal ---
+
+    def _journal_path(self, pid):
+        return os.path.join(self.journal_dir, f'attendance.{pid}.journal')
+
+    def _write_journal(self, rows):
+        if self._journal is None:
+            return
+        self._journal.write(''.join(_encode(row) for row in rows))
+        self._journal.flush()
+        if self.durability == 'fsync':
+            os.fsync(self._journal.fileno())
+
+    def _rewrite_journal(self):
+        if self._journal is None:
+            return
+        path = self._journal_path(self._pid)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as temp:
+            temp.write(''.join(_encode(row) for row in self._rows))
+            temp.flush()
+            if self.durability == 'fsync':
+                os.fsync(temp.fileno())
+        os.replace(temp_path, path)
+        self._journal.close()
+        self._journal = open(path, 'a', encoding='utf-8')
+
+    def _recover_orphans(self):
+        """Queue the rows of journals left by processes that died.
+
+        Returns the rows and the journal files they came from, renamed to
+        ``*.recovering.<our pid>``. The caller deletes those files once the
+        rows are in our own journal; until then a crash leaves them to be
+        claimed again, and the idempotency keys drop any row read twice.
+        """
+        recovered, claimed_paths = [], []
+        for path in glob.glob(os.path.join(self.journal_dir, 'attendance.*.journal*')):
+            parts = os.path.basename(path).split('.')
+            if len(parts) == 3:
+                owner = parts[1]
+            elif len(parts) == 5 and parts[3] == 'recovering':
+                # A recovery that died before it could delete the file
+                owner = parts[4]
+            else:
+                continue  # e.g. a half-written .tmp rewrite; the journal itself is intact
+            try:
+                owner = int(owner)
+            except ValueError:
+                continue
+            # A file under our own pid is from an earlier process that had it
+            if owner != self._pid and _pid_alive(owner):
+                continue
+            claimed = os.path.join(self.journal_dir, f'attendance.{parts[1]}.journal.recovering.{self._pid}')
+            try:
+                # Atomic: if two workers start together only one wins the rename
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            with open(claimed, encoding='utf-8') as journal:
+                rows = [_decode(line) for line in journal if line.strip()]
+            rows = [row for row in rows if row['idempotency_key'] not in self._keys]
+            self._rows.extend(rows)
+            self._keys.update((row['idempotency_key'], row['member_id']) for row in rows)
+            recovered.extend(rows)
+            claimed_paths.append(claimed)
+        return recovered, claimed_paths
+
+
+def get_buffer():
+    return current_app.extensions.get('attendance_buffer')
+
+
+def flush_pending():
+    """Write this process's queued check-ins before a page reads attendance.
+
+    Check-ins queued in other workers appear when their flushers run.
+    """
+    buffer = get_buffer()
+    if buffer is not None and len(buffer):
+        buffer.flush()
+
+
+def init_app(app):
+    if not app.config['ATTENDANCE_BUFFER_ENABLED']:
+        return
+    app.extensions['attendance_buffer'] = AttendanceBuffer(
+        app,
+        max_rows=app.config['ATTENDANCE_BUFFER_MAX_ROWS'],
+        flush_rows=app.config['ATTENDANCE_BUFFER_FLUSH_ROWS'],
+        flush_interval=app.config['ATTENDANCE_BUFFER_FLUSH_INTERVAL'],
+        durability=app.config['ATTENDANCE_BUFFER_DURABILITY'],
+        journal_dir=app.config['ATTENDANCE_JOURNAL_DIR'] or os.path.join(app.instance_path, 'attendance-journal'),
+    )
@@ -0,0 +1,171 @@
+"""Check-ins posted by the front-desk kiosks through the JSON API.
+
+A request carries one check-in or a batch. Each identifies the member by
+``member_id`` or ``card_code`` and may carry an ``idempotency_key``; a key that
+was already recorded returns the original attendance row instead of a second
+one, so a kiosk can safely retry after a timeout. Whatever the batch size, a
+request costs one lookup for the keys, one for the members (primary key and
+``ix_member_card_code``), one insert and one counter update.
+
+With the write-behind buffer enabled the insert is queued instead; those
+results carry ``queued: true`` and no ``attendance_id`` yet.
+
+A ``check_in_time`` is ISO 8601 and read as UTC without an offset; it
+defaults to the time the request arrived.
+"""
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app import db, metrics, attendance_analytics, workout_goals
+from app.attendance_buffer import get_buffer
+from app.database import fits_integer
+from app.models import Member, Attendance
+
+MAX_KEY_LENGTH = 64
+
+# Built once: at kiosk rates, constructing the statements on every request
+# costs more than running them
+_attendance = Attendance.__table__
+_member = Member.__table__
+_RECORDED_KEYS = (
+    db.select(_attendance.c.idempotency_key, _attendance.c.id, _attendance.c.member_id)
+    .where(_attendance.c.idempotency_key.in_(db.bindparam('keys', expanding=True)))
+)
+_MEMBERS = (
+    db.select(_member.c.id, _member.c.card_code, _member.c.name, _member.c.membership_end_date)
+    .where(db.or_(_member.c.id.in_(db.bindparam('ids', expanding=True)),
+                  _member.c.card_code.in_(db.bindparam('codes', expanding=True))))
+)
+_INSERT = _attendance.insert().returning(_attendance.c.id, sort_by_parameter_order=True)
+
+
+def _parse(item, now, max_skew):
+    if not isinstance(item, dict):
+        raise ValueError('expected a JSON object')
+    member_id, card_code = item.get('member_id'), item.get('card_code')
+    if (member_id is None) == (card_code is None):
+        raise ValueError('give exactly one of member_id or card_code')
+    if member_id is not None and (not isinstance(member_id, int) or isinstance(member_id, bool)):
+        raise ValueError('member_id must be an integer')
+    if member_id is not None and not fits_integer(member_id):
+        raise ValueError('member_id is out of range')
+    if card_code is not None and not isinstance(card_code, str):
+        raise ValueError('card_code must be a string')
+
+    check_in_time = item.get('check_in_time')
+    if check_in_time is not None:
+        try:
+            check_in_time = datetime.fromisoformat(check_in_time)
+        except (TypeError, ValueError):
+            raise ValueError('check_in_time must be an ISO 8601 date and time')
+        # Stored as naive UTC, like every other check-in
+        if check_in_time.tzinfo is not None:
+            check_in_time = check_in_time.astimezone(timezone.utc).replace(tzinfo=None)
+        if check_in_time > now + max_skew:
+            raise ValueError('check_in_time is in the future')
+
+    key = item.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not 0 < len(key) <= MAX_KEY_LENGTH):
+        raise ValueError(f'idempotency_key must be a string of 1-{MAX_KEY_LENGTH} characters')
+    return {'member_id': member_id, 'card_code': card_code,
+            'check_in_time': check_in_time, 'idempotency_key': key}
+
+
+def _recorded(keys):
+    if not keys:
+        return {}
+    rows = db.session.execute(_RECORDED_KEYS, {'keys': list(keys)})
+    return {key: (attendance_id, member_id) for key, attendance_id, member_id in rows}
+
+
+def _members(ids, codes):
+    if not ids and not codes:
+        return {}, {}
+    rows = db.session.execute(_MEMBERS, {'ids': list(ids), 'codes': list(codes)}).all()
+    return {row.id: row for row in rows}, {row.card_code: row for row in rows if row.card_code}
+
+
+def record(items, now=None):
+    """Record a list of check-in dicts and return one result dict per item."""
+    try:
+        return _record(items, now)
+    except IntegrityError:
+        # Another worker stored one of these idempotency keys after we looked;
+        # the second pass finds it and reports it as a duplicate.
+        db.session.rollback()
+        return _record(items, now)
+
+
+def _record(items, now):
+    now = now or datetime.utcnow()
+    today = now.date()
+    max_skew = timedelta(seconds=current_app.config['KIOSK_MAX_CLOCK_SKEW'])
+    buffer = get_buffer()
+    results = [None] * len(items)
+    parsed = {}
+    for index, item in enumerate(items):
+        try:
+            parsed[index] = _parse(item, now, max_skew)
+        except ValueError as exc:
+            results[index] = {'status': 'invalid', 'error': str(exc)}
+
+    recorded = _recorded({values['idempotency_key'] for values in parsed.values() if values['idempotency_key']})
+    by_id, by_card = _members({values['member_id'] for values in parsed.values() if values['member_id'] is not None},
+                              {values['card_code'] for values in parsed.values() if values['card_code'] is not None})
+
+    pending, pending_keys = [], {}
+    for index, values in parsed.items():
+        key = values['idempotency_key']
+        if key in recorded:
+            attendance_id, member_id = recorded[key]
+            results[index] = {'status': 'duplicate', 'attendance_id': attendance_id, 'member_id': member_id}
+            continue
+        if key and buffer is not None and buffer.queued_member(key) is not None:
+            results[index] = {'status': 'duplicate', 'attendance_id': None, 'member_id': buffer.queued_member(key)}
+            continue
+        if key in pending_keys:
+            # Same key twice in one batch: the first occurrence wins
+            pending_keys[key].append(index)
+            continue
+
+        if values['member_id'] is not None:
+            member = by_id.get(values['member_id'])
+        else:
+            member = by_card.get(values['card_code'])
+        if member is None:
+            results[index] = {'status': 'unknown_member'}
+            continue
+        if not metrics.is_active(member.membership_end_date, today):
+            results[index] = {'status': 'membership_inactive', 'member_id': member.id, 'member_name': member.name,
+                              'membership_end_date': member.membership_end_date.isoformat()
+                              if member.membership_end_date else None}
+            continue
+
+        pending.append((index, member, {'member_id': member.id, 'check_in_time': values['check_in_time'] or now,
+                                        'idempotency_key': key}))
+        if key:
+            pending_keys[key] = []
+
+    if pending and buffer is not None:
+        for index, member, row in pending:
+            if buffer.append(row['member_id'], row['check_in_time'], row['idempotency_key']):
+                results[index] = {'status': 'checked_in', 'attendance_id': None, 'queued': True,
+                                  'member_id': member.id, 'member_name': member.name}
+            else:
+                results[index] = {'status': 'duplicate', 'attendance_id': None, 'member_id': member.id}
+            for duplicate in pending_keys.get(row['idempotency_key'], ()):
+                results[duplicate] = {'status': 'duplicate', 'attendance_id': None, 'member_id': member.id}
+    elif pending:
+        attendance_ids = db.session.scalars(_INSERT, [row for _, _, row in pending]).all()
+        metrics.increment('total_checkins', len(pending))
+        workout_goals.advance(db.session)
+        db.session.commit()
+        attendance_analytics.forget(*{row['check_in_time'].date() for _, _, row in pending})
+        for (index, member, row), attendance_id in zip(pending, attendance_ids):
+            results[index] = {'status': 'checked_in', 'attendance_id': attendance_id,
+                              'member_id': member.id, 'member_name': member.name}
+            for duplicate in pending_keys.get(row['idempotency_key'], ()):
+                results[duplicate] = {'status': 'duplicate', 'attendance_id': attendance_id, 'member_id': member.id}
+    return results
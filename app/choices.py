@@ -0,0 +1,64 @@
+"""Cached choice lists for the plan, trainer and workout-plan select fields.
+
+Reference data changes a few times a year but was queried on every render
+and submit of the member and payment forms. Each process keeps the lists in
+memory together with the version stamp they were built under. The stamp is
+a small file in the instance folder that every write to the reference
+tables replaces, so all gunicorn workers on the host notice the change with
+a ``stat()`` call instead of a database query.
+"""
+import threading
+import time
+
+from flask import current_app
+
+from app.cache import VersionStamp
+from app.models import MembershipPlan, Trainer, WorkoutPlan
+
+
+class ChoiceCache:
+
+    def __init__(self, version_file, max_age=3600):
+        self.stamp = VersionStamp(version_file)
+        # Also rebuild after max_age, in case the tables were edited
+        # without going through the routes
+        self.max_age = max_age
+        self._lists = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        version = self.stamp.read()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._lists.get(key)
+        if entry is not None and entry[0] == version and now - entry[1] < self.max_age:
+            return entry[2]
+        choices = tuple(loader())
+        with self._lock:
+            self._lists[key] = (version, now, choices)
+        return choices
+
+    def invalidate(self):
+        self.stamp.bump()
+        with self._lock:
+            self._lists.clear()
+
+
+def _cache():
+    return current_app.extensions['choice_cache']
+
+
+def plan_choices():
+    return _cache().get('plans', lambda: [(plan.id, plan.name) for plan in MembershipPlan.query.order_by('name')])
+
+
+def trainer_choices():
+    return _cache().get('trainers', lambda: [(trainer.id, trainer.name) for trainer in Trainer.query.order_by('name')])
+
+
+def workout_plan_choices():
+    return _cache().get('workout_plans', lambda: [(wp.id, wp.name) for wp in WorkoutPlan.query.order_by('name')])
+
+
+def invalidate():
+    _cache().invalidate()
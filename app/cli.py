@@ -0,0 +1,862 @@
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event
+
+from app import db
+from config import Config
+
+GOAL_TYPES = ['daily', 'weekly', 'monthly', 'yearly']
+
+# Tables that grow with the business. Reference tables (plans, trainers,
+# workout plans) hold a handful of rows and are fine to scan.
+HOT_TABLES = {'member', 'attendance', 'payment', 'goal', 'inquiry', 'user'}
+
+CHECKED_ADMIN_URLS = [
+    '/dashboard',
+    '/members',
+    '/members?status=active',
+    '/members?status=expired',
+    '/members?status=expiring',
+    '/members/1',
+    '/payments',
+    '/payments?member_id=1',
+    '/payments?start=2025-01-01&end=2025-01-31',
+    '/payments/add',
+    '/attendance',
+    '/attendance?member_id=1',
+    '/attendance?start=2025-01-01&end=2025-01-07',
+    '/attendance/checkin',
+    '/admin/inquiries',
+    '/goals',
+    '/admin/goals',
+    '/admin/goals?user_id=2',
+    '/admin/goals?status=failed',
+    '/admin/goals?status=all',
+    '/api/goals/chart',
+    '/api/goals/chart?status=active',
+    '/api/goals/chart?user_id=2&metric=recent',
+    '/reports/revenue',
+    '/api/reports/revenue?period=quarter&group=trainer&start=2025-01&end=2025-12',
+    '/reports/attendance?start=2025-01-01&end=2025-01-31',
+    '/trainers',
+    '/plans',
+    '/workout_plans',
+    '/api/reports/utilization',
+    '/api/members/search?q=member%2000',
+    '/api/members/search?q=12',
+    '/api/members/search?q=ber%2000',
+    '/api/users/search?q=MEM',
+]
+
+CHECKED_SUBSCRIPTION_URLS = [
+    '/members/1',
+    '/payments',
+    '/attendance',
+    '/goals',
+    '/goals?status=all',
+    '/api/goals/chart?status=active',
+]
+
+# Pages that render no stored data; any other checked route must run SQL
+STATIC_URLS = ('/attendance/checkin',)
+
+# Routes that rank by a computed value: their sorts sit under a LIMIT and
+# keep only the top rows, so only full scans are reported for them
+RANKED_URL_PREFIXES = ('/api/goals/chart',)
+
+_FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+_TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def _seed_check_db(rows):
+    """Fill an empty database with ``rows`` visits, payments and goals."""
+    from app import goal_lifecycle, metrics
+    from app.models import Member, MembershipPlan, Payment, Attendance, User, Inquiry, Goal
+
+    plan = MembershipPlan(name='Monthly', duration_days=30, price=30.0)
+    db.session.add(plan)
+    admin = User(username='admin', email='admin@example.com', role='admin', password_hash='x')
+    db.session.add(admin)
+
+    members = []
+    for i in range(max(10, rows // 10)):
+        members.append(Member(
+            name=f'Member {i:05d}', email=f'member{i}@example.com', join_date=date(2024, 1, 1),
+            membership_plan=plan, membership_start_date=date(2024, 1, 1),
+            membership_end_date=date.today() + timedelta(days=i % 200 - 100),
+        ))
+    db.session.add_all(members)
+    db.session.flush()
+
+    users = [User(username=f'member{i}', email=member.email, role='subscription',
+                  password_hash='x', member_id=member.id) for i, member in enumerate(members)]
+    db.session.add_all(users)
+    db.session.flush()
+    subscriber = users[0]
+
+    start = datetime(2025, 1, 1, 6)
+    for i in range(rows):
+        member = members[i % len(members)]
+        db.session.add(Attendance(member_id=member.id, check_in_time=start + timedelta(minutes=37 * i)))
+        db.session.add(Payment(member_id=member.id, amount=30.0, plan_id=plan.id,
+                               payment_date=(start + timedelta(hours=3 * i)).date()))
+        db.session.add(Goal(user_id=users[i % len(users)].id, goal_type=GOAL_TYPES[i % 4],
+                            description=f'Goal {i}', target_value=10, unit='workouts',
+                            end_date=datetime.combine(date.today(), start.time()) + timedelta(days=i % 365 - 182)))
+    for i in range(max(10, rows // 10)):
+        db.session.add(Inquiry(name=f'Inquiry {i}', email=f'inquiry{i}@example.com',
+                               submitted_at=start + timedelta(hours=i)))
+    db.session.commit()
+    metrics.rebuild()
+    # Settled as the scheduled sweep leaves them: otherwise the first goal
+    # page sweeps, in more batches the more goals there are
+    goal_lifecycle.sweep()
+    return admin.id, subscriber.id
+
+
+@contextmanager
+def _temp_app(**config):
+    """Yield an app bound to a throwaway, empty SQLite database.
+
+    The cache version stamps and the check-in journal live in the same
+    temporary directory: bumping the instance folder's stamps would make
+    the workers of a running server drop their caches. Keyword arguments
+    override settings of the default Config.
+    """
+    from app import create_app
+
+    directory = tempfile.mkdtemp(prefix='gym-check-')
+    config_class = type('CheckConfig', (Config,), {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'check.db'),
+        'WTF_CSRF_ENABLED': False,
+        'CHOICES_VERSION_FILE': os.path.join(directory, 'choices.version'),
+        'USER_CACHE_VERSION_FILE': os.path.join(directory, 'users.version'),
+        'ATTENDANCE_ANALYTICS_VERSION_FILE': os.path.join(directory, 'analytics.version'),
+        'ATTENDANCE_JOURNAL_DIR': os.path.join(directory, 'attendance-journal'),
+        **config,
+    })
+    app = create_app(config_class)
+    try:
+        with app.app_context():
+            db.create_all()
+        yield app
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def _seeded_app(rows, **config):
+    """Yield an app bound to a throwaway SQLite database seeded with ``rows``."""
+    with _temp_app(**config) as app:
+        with app.app_context():
+            admin_id, subscriber_id = _seed_check_db(rows)
+        yield app, [(admin_id, CHECKED_ADMIN_URLS), (subscriber_id, CHECKED_SUBSCRIPTION_URLS)]
+
+
+def _logged_in_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def _drop_data_caches(app):
+    """Empty the per-process caches of query results, so a request reaches the database."""
+    with app.app_context():
+        app.extensions['dashboard_cache'].clear()
+        app.extensions['utilization_cache'].clear()
+        app.extensions['analytics_cache'].clear()
+        app.extensions['choice_cache'].invalidate()
+
+
+def _capture_get(app, client, url):
+    """GET ``url`` with cold caches and return the response with every statement it executed."""
+    _drop_data_caches(app)
+    with app.app_context():
+        engine = db.engine
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return response, captured
+
+
+def _plan_problems(connection, statement, parameters, ranked=False):
+    details = [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+    tables = {detail.split()[1] for detail in details if detail.startswith(('SCAN ', 'SEARCH '))}
+    problems = []
+    for detail in details:
+        match = _FULL_SCAN.match(detail)
+        if match and match.group(1) in HOT_TABLES:
+            problems.append(detail)
+        elif detail.startswith(_TEMP_SORT) and tables & HOT_TABLES and not ranked:
+            # Sorting every matching row defeats LIMIT on a growing table
+            problems.append(detail)
+    return problems
+
+
+@click.command('explain-routes')
+@click.option('--verbose', is_flag=True, help='Print the plan of every captured query.')
+def explain_routes_command(verbose):
+    """Fail if a hot route's query falls back to a full table scan.
+
+    Builds a throwaway seeded SQLite database, drives the list and dashboard
+    routes through the test client, and runs EXPLAIN QUERY PLAN on every
+    SELECT they issue.
+    """
+    failures = []
+    with _seeded_app(2000) as (app, runs):
+        with app.app_context():
+            engine = db.engine
+        for user_id, urls in runs:
+            client = _logged_in_client(app, user_id)
+            for url in urls:
+                response, captured = _capture_get(app, client, url)
+                if response.status_code != 200:
+                    failures.append((url, f'HTTP {response.status_code}', ''))
+                    continue
+
+                ranked = url.startswith(RANKED_URL_PREFIXES)
+                with engine.connect() as connection:
+                    seen = set()
+                    for statement, parameters in captured:
+                        if statement in seen or not statement.lstrip().upper().startswith('SELECT'):
+                            continue
+                        seen.add(statement)
+                        problems = _plan_problems(connection, statement, parameters, ranked)
+                        for problem in problems:
+                            failures.append((url, problem, statement))
+                        if verbose:
+                            click.echo(f'{url}: {" ".join(statement.split())}')
+                            for problem in problems:
+                                click.echo(f'    !! {problem}')
+
+    for url, problem, statement in failures:
+        click.echo(f'{url}: {problem}\n    {" ".join(statement.split())}', err=True)
+    if failures:
+        raise SystemExit(1)
+    click.echo('All route queries use an index.')
+
+
+@click.command('check-query-counts')
+@click.option('--small', default=10, show_default=True, help='Rows per table in the small database.')
+@click.option('--large', default=10000, show_default=True, help='Rows per table in the large database.')
+def check_query_counts_command(small, large):
+    """Fail if a route issues more SQL statements as its tables grow.
+
+    Drives the same routes against a small and a large seeded database and
+    compares the number of statements each request executes, which catches
+    lazy loads in templates (one extra query per rendered row). A data route
+    that runs no statement at all also fails: its queries bypass the engine
+    events, so neither this check nor explain-routes can see them.
+    """
+    counts = {}
+    for rows in (small, large):
+        with _seeded_app(rows) as (app, runs):
+            for user_id, urls in runs:
+                client = _logged_in_client(app, user_id)
+                for url in urls:
+                    response, captured = _capture_get(app, client, url)
+                    counts.setdefault((user_id, url), []).append(
+                        len(captured) if response.status_code == 200 else f'HTTP {response.status_code}')
+
+    failed = False
+    for (user_id, url), (small_count, large_count) in counts.items():
+        unseen = large_count == 0 and url not in STATIC_URLS
+        status = 'ok' if small_count == large_count and not unseen else 'FAIL'
+        failed = failed or status == 'FAIL'
+        click.echo(f'{status:4}  {url:<50} {small_count} -> {large_count}')
+    if failed:
+        raise SystemExit(1)
+
+
+metrics_cli = AppGroup('metrics', help='Maintain the gym_metrics counters.')
+
+
+@metrics_cli.command('check')
+def metrics_check_command():
+    """Compare the stored counters with the live aggregates."""
+    from app import metrics
+
+    drifted = metrics.drift()
+    for name, (stored, live) in drifted.items():
+        click.echo(f'{name}: stored {stored}, live {live}', err=True)
+    if drifted:
+        raise SystemExit(1)
+    click.echo('All counters match the live aggregates.')
+
+
+@metrics_cli.command('rebuild')
+def metrics_rebuild_command():
+    """Recompute every counter from the source tables."""
+    from app import metrics
+
+    for name, (stored, live) in metrics.drift().items():
+        click.echo(f'{name}: {stored} -> {live}')
+    for name, value in metrics.rebuild().items():
+        click.echo(f'{name} = {value}')
+
+
+memberships_cli = AppGroup('memberships', help='Maintain the stored membership statuses.')
+
+
+@memberships_cli.command('sweep')
+@click.option('--batch-size', default=5000, show_default=True, help='Members updated per transaction.')
+@click.option('--recompute', is_flag=True,
+              help='Recompute every member, e.g. after a restore or manual SQL, instead of only aged ones.')
+def memberships_sweep_command(batch_size, recompute):
+    """Move memberships to expiring/expired as days pass. Run daily after midnight."""
+    from app import memberships
+
+    if recompute:
+        click.echo(f'{memberships.recompute(batch_size=batch_size)} membership statuses corrected.')
+    else:
+        click.echo(f'{memberships.sweep(batch_size=batch_size)} membership statuses moved on.')
+
+
+revenue_cli = AppGroup('revenue', help='Maintain the revenue_month rollup.')
+
+
+@revenue_cli.command('check')
+def revenue_check_command():
+    """Compare the rollup with the payments table, per month and plan."""
+    from app import revenue
+
+    drifted = revenue.drift()
+    for (month, plan_id), (stored, live) in sorted(drifted.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+        click.echo(f'{month} plan {plan_id}: stored {stored}, live {live} (payments, cents)', err=True)
+    if drifted:
+        raise SystemExit(1)
+    click.echo('The revenue rollup matches the payments table.')
+
+
+@revenue_cli.command('rebuild')
+def revenue_rebuild_command():
+    """Recompute the rollup from every payment, using each member's current trainer."""
+    from app import revenue
+
+    click.echo(f'{revenue.rebuild()} rollup rows written.')
+
+
+goals_cli = AppGroup('goals', help='Maintain goal statuses and the progress derived from attendance.')
+
+
+@goals_cli.command('catch-up')
+@click.option('--batch-size', default=50000, show_default=True, help='Attendance ids applied per transaction.')
+def goals_catch_up_command(batch_size):
+    """Apply check-ins not yet counted towards workouts goals, e.g. rows added by hand."""
+    from app import workout_goals
+
+    click.echo(f'{workout_goals.catch_up(batch_size)} workouts added to goals.')
+
+
+@goals_cli.command('sweep')
+@click.option('--batch-size', default=5000, show_default=True, help='Goals updated per transaction.')
+def goals_sweep_command(batch_size):
+    """Move finished goals to completed/failed. Run from cron, e.g. hourly."""
+    from app import goal_lifecycle
+
+    click.echo(f'{goal_lifecycle.sweep(batch_size=batch_size)} goals settled.')
+
+
+@goals_cli.command('check')
+@click.option('--limit', default=100, show_default=True, help='Goals listed at most.')
+def goals_check_command(limit):
+    """Compare active workouts goals with their check-ins, up to the high-water mark."""
+    from app import workout_goals
+
+    drifted = workout_goals.drift(limit)
+    for goal_id, stored, derived in drifted:
+        click.echo(f'goal {goal_id}: stored {stored}, derived {derived} (workouts)', err=True)
+    if drifted:
+        raise SystemExit(1)
+    click.echo('Every active workouts goal matches its check-ins.')
+
+
+@goals_cli.command('rebuild')
+@click.option('--batch-size', default=5000, show_default=True, help='Goals recounted per transaction.')
+def goals_rebuild_command(batch_size):
+    """Recount every active workouts goal from attendance. Run once after upgrading."""
+    from app import workout_goals
+
+    click.echo(f'{workout_goals.rebuild(batch_size)} goals recounted.')
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(['members', 'payments', 'attendance']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='File format; defaults to csv for *.csv and ndjson otherwise.')
+@click.option('--batch-size', type=int, help='Rows per transaction (default: IMPORT_BATCH_SIZE).')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False, writable=True),
+              help='Write the rejected rows to this CSV file instead of the terminal.')
+def import_command(kind, path, fmt, batch_size, errors_path):
+    """Bulk-load members, payments or attendance from a CSV or NDJSON file."""
+    import csv
+    import time
+
+    from app import importer
+
+    started = time.perf_counter()
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as stream:
+        report = importer.import_stream(kind, stream, fmt or importer.detect_format(path), batch_size)
+    elapsed = time.perf_counter() - started
+
+    if errors_path:
+        with open(errors_path, 'w', newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(['row', 'error'])
+            writer.writerows(report.errors)
+    else:
+        for row_number, message in report.errors:
+            click.echo(f'row {row_number}: {message}', err=True)
+    if report.truncated:
+        click.echo(f'Only the first {len(report.errors)} errors were kept.', err=True)
+    click.echo(f'Imported {report.inserted} {kind} rows in {elapsed:.1f}s, {report.failed} rejected.')
+    if report.failed:
+        raise SystemExit(1)
+
+
+@click.command('seed')
+@click.option('--members', default=20000, show_default=True, help='Members to create.')
+@click.option('--attendance', default=2000000, show_default=True, help='Check-ins to create (approximately).')
+@click.option('--years', default=3, show_default=True, help='Years of history before --end-date.')
+@click.option('--goals-per-user', default=3, show_default=True, help='Average goals per member user.')
+@click.option('--inquiries', type=int, help='Inquiries to create (default: a tenth of --members).')
+@click.option('--seed', 'random_seed', default=42, show_default=True, help='Random seed.')
+@click.option('--end-date', type=click.DateTime(['%Y-%m-%d']), help='Last day of history (default: today).')
+@click.option('--batch-size', default=50000, show_default=True, help='Rows per insert transaction.')
+def seed_command(members, attendance, years, goals_per_user, inquiries, random_seed, end_date, batch_size):
+    """Fill an empty database with a large, realistic dataset.
+
+    The same options (including --end-date) always generate the same rows.
+    Member users get the password "password". Run `flask db upgrade` first.
+    """
+    import time
+
+    from app import seed
+    from app.models import Member
+
+    if db.session.scalar(db.select(Member.id).limit(1)) is not None:
+        raise click.UsageError('The database already has members; seed an empty database.')
+    started = time.perf_counter()
+    counts = seed.generate(members=members, attendance=attendance, years=years, goals_per_user=goals_per_user,
+                           inquiries=inquiries, seed=random_seed, end_date=end_date.date() if end_date else None,
+                           batch_size=batch_size, echo=click.echo)
+    click.echo(', '.join(f'{count} {table}' for table, count in counts.items())
+               + f' in {time.perf_counter() - started:.0f}s.')
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def _hammer(deadline, request, latencies, statuses):
+    """Call ``request()`` until ``deadline``, recording latency and status codes."""
+    import time
+
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        status = request()
+        latencies.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+def _run_load(duration, login_threads, browse_threads, login, browse):
+    """Run both kinds of client for ``duration`` seconds and return their results."""
+    import threading
+    import time
+
+    deadline = time.perf_counter() + duration
+    results = {'login': ([], {}), 'browse': ([], {})}
+    threads = [threading.Thread(target=_hammer, args=(deadline, login(), *results['login']))
+               for _ in range(login_threads)]
+    threads += [threading.Thread(target=_hammer, args=(deadline, browse(), *results['browse']))
+                for _ in range(browse_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@click.command('bench-login')
+@click.option('--duration', default=10.0, show_default=True, help='Seconds per phase.')
+@click.option('--logins', 'login_threads', default=8, show_default=True,
+              help='Concurrent clients posting the login form.')
+@click.option('--browsers', 'browse_threads', default=2, show_default=True,
+              help='Concurrent logged-in clients browsing other pages.')
+@click.option('--rounds', type=int, help='bcrypt cost (default: BCRYPT_LOG_ROUNDS).')
+@click.option('--workers', type=int, help='Password check pool size (default: PASSWORD_CHECK_WORKERS).')
+def bench_login_command(duration, login_threads, browse_threads, rounds, workers):
+    """Measure logins, and the rest of the site, during a login storm.
+
+    Seeds a throwaway database, measures the throughput of a few admin pages
+    on their own, then again while ``--logins`` clients sign in as fast as
+    they can. Reports login latency percentiles, how many logins were turned
+    away, the password pool's queue time and the other pages' throughput.
+    """
+    from app import bcrypt
+    from app.models import User
+
+    config = {}
+    if rounds is not None:
+        config['BCRYPT_LOG_ROUNDS'] = rounds
+    if workers is not None:
+        config['PASSWORD_CHECK_WORKERS'] = workers
+    with _seeded_app(200, **config) as (app, runs):
+        admin_id, urls = runs[0]
+        with app.app_context():
+            # One hash for every account keeps seeding fast
+            password_hash = bcrypt.generate_password_hash('benchmark').decode('utf-8')
+            db.session.execute(db.update(User).values(password_hash=password_hash))
+            db.session.commit()
+            usernames = list(db.session.scalars(db.select(User.username).where(User.role == 'subscription')))
+
+        def login():
+            counter = iter(range(10 ** 9))
+
+            def request():
+                # A fresh client each time: a logged-in one skips the password check
+                username = usernames[next(counter) % len(usernames)]
+                return app.test_client().post(
+                    '/login', data={'username': username, 'password': 'benchmark'}).status_code
+            return request
+
+        def browse():
+            client = _logged_in_client(app, admin_id)
+            counter = iter(range(10 ** 9))
+            pages = ['/members', '/payments', '/attendance', '/api/members/search?q=member%2000']
+
+            def request():
+                return client.get(pages[next(counter) % len(pages)]).status_code
+            return request
+
+        checker = app.extensions['password_checker']
+        click.echo(f'bcrypt cost {app.config["BCRYPT_LOG_ROUNDS"]}, {checker.workers} check workers, '
+                   f'{login_threads} login clients, {browse_threads} browsing clients, {duration:g}s per phase')
+
+        quiet = _run_load(duration, 0, browse_threads, login, browse)['browse'][0]
+        storm = _run_load(duration, login_threads, browse_threads, login, browse)
+        login_latencies, login_statuses = storm['login']
+        browse_latencies, browse_statuses = storm['browse']
+
+        click.echo(f'browse alone:       {len(quiet) / duration:7.1f} req/s  '
+                   f'p99 {_percentile(quiet, 0.99) * 1000:7.1f} ms')
+        click.echo(f'browse under storm: {len(browse_latencies) / duration:7.1f} req/s  '
+                   f'p99 {_percentile(browse_latencies, 0.99) * 1000:7.1f} ms  statuses {browse_statuses}')
+        click.echo(f'logins:             {len(login_latencies) / duration:7.1f} req/s  '
+                   + '  '.join(f'p{int(q * 100)} {_percentile(login_latencies, q) * 1000:.1f} ms'
+                               for q in (0.5, 0.95, 0.99))
+                   + f'  statuses {login_statuses}')
+        stats = checker.stats()
+        click.echo(f'password pool:      queue p50 {stats["queue_ms"]["p50"]} ms, p99 {stats["queue_ms"]["p99"]} ms, '
+                   f'run p50 {stats["run_ms"]["p50"]} ms, {stats["rejected"]} rejected, '
+                   f'{stats["timed_out"]} timed out')
+
+
+def _bench_db_worker(app, kind, user_id, member_ids, duration, results):
+    """Drive one kind of traffic from a forked process and report its counts."""
+    import random
+    import time
+
+    with app.app_context():
+        # Never share the parent's pooled connections across a fork
+        db.engine.dispose(close=False)
+    app.logger.disabled = True
+    rng = random.Random(user_id * 1000 + len(kind))
+    if kind == 'writer':
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer bench'}
+
+        def request():
+            return client.post('/api/checkins', headers=headers,
+                               json={'member_id': rng.choice(member_ids)}).status_code
+    else:
+        client = _logged_in_client(app, user_id)
+        pages = ['/attendance', '/payments', '/members', '/attendance?member_id=1']
+
+        def request():
+            return client.get(rng.choice(pages)).status_code
+
+    latencies, statuses = [], {}
+    _hammer(time.perf_counter() + duration, request, latencies, statuses)
+    results.put((kind, latencies, statuses))
+
+
+@click.command('bench-db')
+@click.option('--duration', default=10.0, show_default=True, help='Seconds per profile.')
+@click.option('--writers', default=4, show_default=True, help='Processes posting kiosk check-ins.')
+@click.option('--readers', default=4, show_default=True, help='Processes browsing list pages.')
+def bench_db_command(duration, writers, readers):
+    """Compare SQLite throughput with the default and production settings.
+
+    For each profile, seeds a throwaway database and forks ``--writers``
+    processes posting check-ins to the kiosk API and ``--readers`` processes
+    loading list pages, like gunicorn workers sharing one database file.
+    Reports requests per second, p99 latency and failed requests (a
+    "database is locked" error surfaces as HTTP 500).
+    """
+    import multiprocessing
+
+    from app import metrics
+    from app.models import Member
+    from config import ProductionConfig
+
+    profiles = [
+        ('default', {}),
+        ('production', {'SQLITE_PRAGMAS': ProductionConfig.SQLITE_PRAGMAS,
+                        'SQLALCHEMY_ENGINE_OPTIONS': ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS}),
+    ]
+    context = multiprocessing.get_context('fork')
+    for name, config in profiles:
+        with _seeded_app(2000, KIOSK_API_TOKENS=['bench'], **config) as (app, runs):
+            admin_id = runs[0][0]
+            with app.app_context():
+                member_ids = list(db.session.scalars(
+                    db.select(Member.id).where(Member.membership_end_date >= date.today())))
+                journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+                db.session.remove()
+                db.engine.dispose()
+
+            results = context.Queue()
+            processes = [context.Process(target=_bench_db_worker,
+                                         args=(app, kind, admin_id, member_ids, duration, results))
+                         for kind in ['writer'] * writers + ['reader'] * readers]
+            for process in processes:
+                process.start()
+            totals = {'writer': ([], {}), 'reader': ([], {})}
+            for _ in processes:
+                kind, latencies, statuses = results.get()
+                totals[kind][0].extend(latencies)
+                for status, count in statuses.items():
+                    totals[kind][1][status] = totals[kind][1].get(status, 0) + count
+            for process in processes:
+                process.join()
+
+            click.echo(f'{name} (journal_mode={journal_mode}):')
+            for kind, (latencies, statuses) in totals.items():
+                failed = sum(count for status, count in statuses.items() if status >= 500)
+                click.echo(f'  {kind}s: {len(latencies) / duration:7.1f} req/s  '
+                           f'p99 {_percentile(latencies, 0.99) * 1000:7.1f} ms  {failed} failed')
+            with app.app_context():
+                drifted = metrics.drift()
+            if drifted:
+                click.echo(f'  counters drifted: {drifted}', err=True)
+
+
+def _route_cases(app, today):
+    """Return ``(name, user id or None, request factory, expected status)`` for each benchmarked route."""
+    import itertools
+
+    from app import workout_goals
+    from app.models import Member, MembershipPlan, User, Goal
+
+    with app.app_context():
+        admin = User(username='admin', email='admin@example.com', role='admin')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+        member_ids = list(db.session.scalars(
+            db.select(Member.id).where(Member.membership_end_date >= today).order_by(Member.id).limit(500)))
+        plan_id = db.session.scalar(db.select(MembershipPlan.id).order_by(MembershipPlan.id))
+        # The member user with the most goals: the slowest goals page
+        subscriber_id, username = db.session.execute(
+            db.select(User.id, User.username).join(Goal, Goal.user_id == User.id)
+            .where(User.role == 'subscription').group_by(User.id)
+            .order_by(db.func.count().desc(), User.id).limit(1)).one()
+        # Goals whose progress users set: the API refuses samples for workouts goals
+        goal_ids = list(db.session.scalars(
+            db.select(Goal.id).where(db.func.lower(Goal.unit).notin_(workout_goals.WORKOUT_UNITS))
+            .order_by(Goal.id).limit(1000)))
+
+    members = itertools.cycle(member_ids)
+    check_in_time = datetime.combine(today, datetime.min.time()).replace(hour=6)
+
+    def check_in(client):
+        return client.post('/attendance/checkin', data={
+            'member': next(members), 'check_in_time': check_in_time.strftime('%Y-%m-%d %H:%M')})
+
+    def add_payment(client):
+        return client.post('/payments/add', data={
+            'member': next(members), 'amount': '30', 'payment_date': today.isoformat(), 'membership_plan': plan_id})
+
+    def sync_goal_progress(client):
+        # Measured now, so every request is newer than the last and writes
+        measured_at = datetime.utcnow().isoformat()
+        return client.post('/api/goals/progress', json={'updates': [
+            {'goal_id': goal_id, 'value': 1.0, 'timestamp': measured_at} for goal_id in goal_ids]})
+
+    def login(client):
+        return app.test_client().post('/login', data={'username': username, 'password': 'password'})
+
+    def get(url):
+        return lambda client: client.get(url)
+
+    return [
+        ('dashboard', admin_id, get('/dashboard'), 200),
+        ('list_members', admin_id, get('/members'), 200),
+        ('list_attendance', admin_id, get('/attendance'), 200),
+        ('list_payments', admin_id, get('/payments'), 200),
+        ('check_in', admin_id, check_in, 302),
+        ('add_payment', admin_id, add_payment, 302),
+        ('list_goals', subscriber_id, get('/goals'), 200),
+        ('admin_list_goals', admin_id, get('/admin/goals'), 200),
+        ('goal_chart', subscriber_id, get('/api/goals/chart'), 200),
+        ('admin_goal_chart', admin_id, get('/api/goals/chart'), 200),
+        ('sync_goal_progress', admin_id, sync_goal_progress, 200),
+        ('revenue_report', admin_id, get('/api/reports/revenue?period=quarter&group=trainer'), 200),
+        # After the first request, every past day's summary comes from the cache
+        ('list_trainers', admin_id, get('/trainers'), 200),
+        ('attendance_report', admin_id,
+         get(f'/api/reports/attendance?start={today - timedelta(days=364)}&end={today}'), 200),
+        ('login', None, login, 302),
+    ]
+
+
+def _measure_route(app, client, send, expected, count):
+    """Time ``count`` requests, then measure one more's queries and peak memory."""
+    import time
+    import tracemalloc
+
+    with app.app_context():
+        engine = db.engine
+    queries = []
+
+    def count_query(*args):
+        queries.append(1)
+
+    send(client)  # Warm up caches and compiled statements
+    latencies, unexpected = [], 0
+    for _ in range(count):
+        started = time.perf_counter()
+        status = send(client).status_code
+        latencies.append(time.perf_counter() - started)
+        unexpected += status != expected
+
+    event.listen(engine, 'before_cursor_execute', count_query)
+    tracemalloc.start()
+    try:
+        send(client)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        event.remove(engine, 'before_cursor_execute', count_query)
+
+    return {
+        'p50_ms': round(_percentile(latencies, 0.5) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        'queries': len(queries),
+        'peak_kib': round(peak / 1024, 1),
+        'unexpected_status': unexpected,
+    }
+
+
+def _git_commit():
+    import subprocess
+
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.dirname(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.command('bench-routes')
+@click.option('--members', default=5000, show_default=True, help='Members in the synthetic database.')
+@click.option('--attendance', default=500000, show_default=True, help='Check-ins in the synthetic database.')
+@click.option('--requests', 'count', default=50, show_default=True, help='Timed requests per route.')
+@click.option('--seed', 'random_seed', default=42, show_default=True, help='Random seed for the dataset.')
+@click.option('--route', 'only', multiple=True, help='Only benchmark these routes (repeatable).')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Write the results to this JSON file.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Compare with the results of an earlier run and fail on regressions.')
+@click.option('--max-slowdown', default=1.5, show_default=True,
+              help='With --baseline: fail when a p95 grows by more than this factor.')
+def bench_routes_command(members, attendance, count, random_seed, only, output, baseline, max_slowdown):
+    """Benchmark the hot routes against a generated database.
+
+    Generates a dataset with the `flask seed` generator in a throwaway SQLite
+    file, then drives each route through the test client and reports p50,
+    p95 and p99 latency, queries per request and peak Python memory of one
+    request. Save the results with --output and compare a later commit with
+    --baseline: a p95 more than --max-slowdown times the baseline, or any
+    extra query, is a regression.
+    """
+    import json
+
+    from app import seed
+
+    # The routes judge memberships and goals against the real date, so the
+    # generated history has to end on it too
+    today = datetime.utcnow().date()
+    results = {'commit': _git_commit(), 'created': datetime.utcnow().isoformat(timespec='seconds'),
+               'dataset': {'members': members, 'attendance': attendance, 'seed': random_seed},
+               'requests': count, 'routes': {}}
+    with _temp_app() as app:
+        with app.app_context():
+            seed.generate(members=members, attendance=attendance, seed=random_seed, end_date=today,
+                          echo=lambda message: None)
+        for name, user_id, send, expected in _route_cases(app, today):
+            if only and name not in only:
+                continue
+            client = _logged_in_client(app, user_id) if user_id else app.test_client()
+            route = results['routes'][name] = _measure_route(app, client, send, expected, count)
+            click.echo(f'{name:<18} p50 {route["p50_ms"]:8.2f} ms  p95 {route["p95_ms"]:8.2f} ms  '
+                       f'p99 {route["p99_ms"]:8.2f} ms  {route["queries"]:3} queries  {route["peak_kib"]:8.1f} KiB'
+                       + (f'  {route["unexpected_status"]} unexpected responses' if route['unexpected_status'] else ''))
+
+    if output:
+        with open(output, 'w') as out:
+            json.dump(results, out, indent=2)
+
+    if baseline:
+        with open(baseline) as source:
+            before = json.load(source)
+        regressions = []
+        for name, route in results['routes'].items():
+            old = before['routes'].get(name)
+            if old is None:
+                continue
+            if route['p95_ms'] > old['p95_ms'] * max_slowdown:
+                regressions.append(f'{name}: p95 {old["p95_ms"]} ms -> {route["p95_ms"]} ms')
+            if route['queries'] > old['queries']:
+                regressions.append(f'{name}: {old["queries"]} -> {route["queries"]} queries')
+        for regression in regressions:
+            click.echo(f'REGRESSION {regression}', err=True)
+        if regressions:
+            raise SystemExit(1)
+        click.echo(f'No regressions against {before.get("commit") or baseline}.')
+
+
+def init_app(app):
+    app.cli.add_command(explain_routes_command)
+    app.cli.add_command(check_query_counts_command)
+    app.cli.add_command(metrics_cli)
+    app.cli.add_command(memberships_cli)
+    app.cli.add_command(revenue_cli)
+    app.cli.add_command(goals_cli)
+    app.cli.add_command(import_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(bench_login_command)
+    app.cli.add_command(bench_db_command)
+    app.cli.add_command(bench_routes_command)
@@ -0,0 +1,40 @@
+"""Per-connection SQLite settings.
+
+The PRAGMAs in ``SQLITE_PRAGMAS`` are run on every new DBAPI connection from
+a ``connect`` event, so every pooled connection (and the migration runner,
+which shares the engine) gets them. ``journal_mode=WAL`` is stored in the
+database file; the others only last for the connection.
+"""
+from sqlalchemy import event
+
+from app import db
+
+# SQLite integers are signed 64-bit; binding a wider int raises OverflowError
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+
+def fits_integer(value):
+    return MIN_INTEGER <= value <= MAX_INTEGER
+
+
+def _pragma_setter(pragmas):
+    statements = [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def init_app(app):
+    pragmas = app.config['SQLITE_PRAGMAS']
+    if not pragmas:
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _pragma_setter(pragmas))
@@ -0,0 +1,104 @@
+"""Streaming CSV/NDJSON export of payments, attendance and members.
+
+Rows are fetched ``EXPORT_CHUNK_SIZE`` at a time with ``yield_per`` and
+written out chunk by chunk from a generator, so the response starts straight
+away and memory stays flat however many rows the export covers.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import current_app
+
+from app import db
+from app.models import Member, MembershipPlan, Payment, Attendance, Trainer, WorkoutPlan, MEMBERSHIP_STATUSES
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def payments(start=None, end=None, member_id=None):
+    statement = (
+        db.select(Payment.id, Payment.member_id, Member.name.label('member_name'),
+                  # Cents back to an exact two-place amount, the format the importer reads
+                  db.cast(Payment.amount_cents / 100.0, db.Numeric(12, 2)).label('amount'),
+                  Payment.payment_date, Payment.plan_id, MembershipPlan.name.label('plan_name'))
+        .join(Member, Payment.member_id == Member.id)
+        .outerjoin(MembershipPlan, Payment.plan_id == MembershipPlan.id)
+        .order_by(Payment.payment_date, Payment.id)
+    )
+    if member_id:
+        statement = statement.where(Payment.member_id == member_id)
+    if start:
+        statement = statement.where(Payment.payment_date >= start)
+    if end:
+        statement = statement.where(Payment.payment_date <= end)
+    return statement
+
+
+def attendance(start=None, end=None, member_id=None):
+    statement = (
+        db.select(Attendance.id, Attendance.member_id, Member.name.label('member_name'),
+                  Attendance.check_in_time, Attendance.check_out_time)
+        .join(Member, Attendance.member_id == Member.id)
+        .order_by(Attendance.check_in_time, Attendance.id)
+    )
+    if member_id:
+        statement = statement.where(Attendance.member_id == member_id)
+    if start:
+        statement = statement.where(Attendance.check_in_time >= datetime.combine(start, datetime.min.time()))
+    if end:
+        statement = statement.where(
+            Attendance.check_in_time < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return statement
+
+
+def members(start=None, end=None, status=None):
+    """Member roster; ``start``/``end`` filter on the join date."""
+    statement = (
+        db.select(Member.id, Member.name, Member.email, Member.phone, Member.card_code, Member.join_date,
+                  MembershipPlan.name.label('membership_plan'), Member.membership_start_date,
+                  Member.membership_end_date, Member.membership_status, Trainer.name.label('trainer'),
+                  WorkoutPlan.name.label('workout_plan'))
+        .outerjoin(MembershipPlan, Member.membership_plan_id == MembershipPlan.id)
+        .outerjoin(Trainer, Member.trainer_id == Trainer.id)
+        .outerjoin(WorkoutPlan, Member.workout_plan_id == WorkoutPlan.id)
+        .order_by(Member.id)
+    )
+    if status in MEMBERSHIP_STATUSES:
+        statement = statement.where(Member.membership_status == status)
+    if start:
+        statement = statement.where(Member.join_date >= start)
+    if end:
+        statement = statement.where(Member.join_date <= end)
+    return statement
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def generate(statement, fmt, chunk_size=None):
+    """Yield the rows of ``statement`` as CSV or NDJSON text, one chunk at a time."""
+    chunk_size = chunk_size or current_app.config['EXPORT_CHUNK_SIZE']
+    result = db.session.execute(statement, execution_options={'yield_per': chunk_size})
+    columns = list(result.keys())
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        for rows in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    else:
+        for rows in result.partitions():
+            yield ''.join(json.dumps(dict(zip(columns, row)), default=_json_default) + '\n' for row in rows)
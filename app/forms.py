@@ -1,9 +1,65 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField, DateField, SelectField, FloatField, IntegerField, DateTimeField, TextAreaField, PasswordField, BooleanField
-from wtforms.validators import DataRequired, Email, Optional, NumberRange, EqualTo, ValidationError
-from app.models import MembershipPlan, Trainer, WorkoutPlan, Member, User # Import User
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, SubmitField, DateField, SelectField, FloatField, DecimalField, IntegerField, DateTimeField, TextAreaField, PasswordField, BooleanField
+from wtforms.validators import DataRequired, Email, Optional, NumberRange, EqualTo, Length, ValidationError
+from wtforms.widgets import html_params
+from flask import url_for
+from markupsafe import Markup
+from app import db, choices
+from app.models import Member, User # Import User
+from app.search import lookup_label
 from datetime import date, datetime
 
+
+class LookupWidget:
+    """A text box backed by a search endpoint, plus the hidden id it selects."""
+
+    def __call__(self, field, **kwargs):
+        # The visible box takes the field id so the <label> points at it
+        hidden_id = f'{field.id}-value'
+        list_id = f'{field.id}-options'
+        search_params = html_params(
+            type='text', id=field.id, list=list_id, autocomplete='off',
+            value=field.selected_label() or '', placeholder=field.placeholder,
+            data_lookup_url=url_for(field.search_endpoint), data_lookup_target=hidden_id,
+            **kwargs)
+        hidden_params = html_params(type='hidden', id=hidden_id, name=field.name, value=field._value())
+        return Markup(f'<input {search_params}><datalist id="{list_id}"></datalist><input {hidden_params}>')
+
+
+class LookupField(IntegerField):
+    """The id of a record picked through a typeahead search endpoint.
+
+    Unlike a SelectField it has no choices, so building the form runs no
+    query; validation only checks that the submitted id exists.
+    """
+    widget = LookupWidget()
+
+    def __init__(self, label=None, validators=None, model=None, label_attr='name',
+                 search_endpoint=None, placeholder='Start typing to search...', **kwargs):
+        super(LookupField, self).__init__(label, validators, **kwargs)
+        self.model = model
+        self.label_attr = label_attr
+        self.search_endpoint = search_endpoint
+        self.placeholder = placeholder
+
+    def process_data(self, value):
+        # Populating from obj= hands us the related object rather than its id
+        if isinstance(value, self.model):
+            value = value.id
+        super(LookupField, self).process_data(value)
+
+    def selected(self):
+        return db.session.get(self.model, self.data) if self.data else None
+
+    def selected_label(self):
+        obj = self.selected()
+        return lookup_label(obj, self.label_attr) if obj else None
+
+    def pre_validate(self, form):
+        if self.data and self.selected() is None:
+            raise ValidationError(self.gettext('Not a valid choice.'))
+
 class InquiryForm(FlaskForm):
     name = StringField('Full Name', validators=[DataRequired()])
     email = StringField('Email', validators=[DataRequired(), Email()])
@@ -15,6 +71,7 @@ class MemberForm(FlaskForm):
     name = StringField('Full Name', validators=[DataRequired()])
     email = StringField('Email', validators=[DataRequired(), Email()])
     phone = StringField('Phone Number', validators=[Optional()])
+    card_code = StringField('Access Card Code', validators=[Optional(), Length(max=32)])
     
     # Dynamically loaded choices for SelectField
     membership_plan = SelectField('Membership Plan', coerce=int, validators=[Optional()])
@@ -28,14 +85,15 @@ class MemberForm(FlaskForm):
 
     def __init__(self, *args, **kwargs):
         super(MemberForm, self).__init__(*args, **kwargs)
-        self.membership_plan.choices = [(plan.id, plan.name) for plan in MembershipPlan.query.order_by('name').all()]
-        self.membership_plan.choices.insert(0, (0, 'Select a plan')) # Add a default "Select" option
-
-        self.trainer.choices = [(trainer.id, trainer.name) for trainer in Trainer.query.order_by('name').all()]
-        self.trainer.choices.insert(0, (0, 'Select a trainer'))
+        self._member_id = getattr(kwargs.get('obj'), 'id', None)
+        self.membership_plan.choices = [(0, 'Select a plan')] + list(choices.plan_choices()) # Add a default "Select" option
+        self.trainer.choices = [(0, 'Select a trainer')] + list(choices.trainer_choices())
+        self.workout_plan.choices = [(0, 'Select a workout plan')] + list(choices.workout_plan_choices())
 
-        self.workout_plan.choices = [(wp.id, wp.name) for wp in WorkoutPlan.query.order_by('name').all()]
-        self.workout_plan.choices.insert(0, (0, 'Select a workout plan'))
+    def validate_card_code(self, card_code):
+        member = Member.query.filter_by(card_code=card_code.data).first()
+        if member is not None and member.id != self._member_id:
+            raise ValidationError('This card is already assigned to another member.')
 
 class MemberAndUserForm(MemberForm):
     username = StringField('Username', validators=[DataRequired()])
@@ -61,29 +119,25 @@ class MembershipPlanForm(FlaskForm):
     submit = SubmitField('Submit')
 
 class PaymentForm(FlaskForm):
-    member = SelectField('Member', coerce=int, validators=[DataRequired()])
-    amount = FloatField('Amount', validators=[DataRequired(), NumberRange(min=0)])
+    member = LookupField('Member', validators=[DataRequired()], model=Member, search_endpoint='main.search_members')
+    amount = DecimalField('Amount', places=2, validators=[DataRequired(), NumberRange(min=0)])
     payment_date = DateField('Payment Date', format='%Y-%m-%d', default=date.today, validators=[DataRequired()])
     membership_plan = SelectField('Membership Plan (Optional)', coerce=int, validators=[Optional()])
     submit = SubmitField('Record Payment')
 
     def __init__(self, *args, **kwargs):
         super(PaymentForm, self).__init__(*args, **kwargs)
-        self.member.choices = [(m.id, m.name) for m in Member.query.order_by('name').all()]
-        self.member.choices.insert(0, (0, 'Select a member'))
-
-        self.membership_plan.choices = [(plan.id, plan.name) for plan in MembershipPlan.query.order_by('name').all()]
-        self.membership_plan.choices.insert(0, (0, 'No specific plan'))
+        self.membership_plan.choices = [(0, 'No specific plan')] + list(choices.plan_choices())
 
 class AttendanceForm(FlaskForm):
-    member = SelectField('Member', coerce=int, validators=[DataRequired()])
+    member = LookupField('Member', validators=[DataRequired()], model=Member, search_endpoint='main.search_members')
     check_in_time = DateTimeField('Check-in Time', format='%Y-%m-%d %H:%M', default=datetime.now, validators=[DataRequired()])
     submit = SubmitField('Check In')
 
-    def __init__(self, *args, **kwargs):
-        super(AttendanceForm, self).__init__(*args, **kwargs)
-        self.member.choices = [(m.id, m.name) for m in Member.query.order_by('name').all()]
-        self.member.choices.insert(0, (0, 'Select a member'))
+class ImportForm(FlaskForm):
+    kind = SelectField('Import', choices=[('members', 'Members'), ('payments', 'Payments'), ('attendance', 'Attendance')])
+    file = FileField('CSV or NDJSON File', validators=[FileRequired(), FileAllowed(['csv', 'ndjson', 'jsonl', 'json'], 'CSV or NDJSON files only.')])
+    submit = SubmitField('Import')
 
 class TrainerForm(FlaskForm):
     name = StringField('Trainer Name', validators=[DataRequired()])
@@ -132,12 +186,8 @@ class GoalForm(FlaskForm):
     submit = SubmitField('Set Goal')
 
 class AdminGoalForm(GoalForm):
-    user = SelectField('Assign to User', coerce=int, validators=[DataRequired()])
+    user = LookupField('Assign to User', validators=[DataRequired()], model=User, label_attr='username',
+                       search_endpoint='main.search_users')
     is_beginner_goal = BooleanField('Mark as Beginner Goal')
     is_admin_set = BooleanField('Admin Set Goal (Non-editable by User)')
     submit = SubmitField('Set Admin Goal')
-
-    def __init__(self, *args, **kwargs):
-        super(AdminGoalForm, self).__init__(*args, **kwargs)
-        self.user.choices = [(u.id, u.username) for u in User.query.order_by('username').all()]
-        self.user.choices.insert(0, (0, 'Select a user'))
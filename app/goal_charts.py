@@ -0,0 +1,78 @@
+"""Goal progress charts, aggregated in SQL.
+
+The goal pages render without any chart data; ``static/js/goal_charts.js``
+fetches it from ``/api/goals/chart`` once the page is up. One grouped query
+gives each goal type's totals and one more picks each type's top ``limit``
+goals by the chosen metric, so the payload stays the same size however many
+goals there are. Responses carry an ETag, and a browser that already has
+the current data gets an empty 304.
+"""
+from app import db
+from app.models import Goal, User
+
+GOAL_TYPES = ('daily', 'weekly', 'monthly', 'yearly')
+
+_goal = Goal.__table__
+_user = User.__table__
+
+_progress = db.case((_goal.c.target_value > 0, db.func.coalesce(_goal.c.current_value, 0) / _goal.c.target_value),
+                    else_=0)
+
+# What "top N" ranks by, largest first
+METRICS = {
+    'progress': _progress,
+    'current': db.func.coalesce(_goal.c.current_value, 0),
+    'target': _goal.c.target_value,
+    'recent': _goal.c.updated_at,
+}
+
+
+def chart_data(user_id=None, metric='progress', limit=20, with_usernames=False, status=None):
+    """Per goal type, in ``GOAL_TYPES`` order: totals over every goal, and the top ``limit`` goals by ``metric``.
+
+    ``user_id`` restricts both to one user's goals, and ``status`` to goals in that status.
+    """
+    scope = [_goal.c.user_id == user_id] if user_id else []
+    if status:
+        scope.append(_goal.c.status == status)
+
+    totals = db.session.execute(
+        db.select(_goal.c.goal_type, db.func.count(),
+                  db.func.sum(db.case((_progress >= 1, 1), else_=0)),
+                  db.func.avg(db.case((_progress > 1, 1), else_=_progress)))
+        .where(*scope).group_by(_goal.c.goal_type))
+
+    # ORDER BY ... LIMIT per type keeps only the top rows while it reads;
+    # ranking every goal with a window function cost four times as much
+    ordering = METRICS[metric].label('ordering')
+    parts = [
+        db.select(_goal.c.id, _goal.c.goal_type, _goal.c.description, _goal.c.current_value,
+                  _goal.c.target_value, _goal.c.user_id, ordering)
+        .where(*scope, _goal.c.goal_type == goal_type)
+        .order_by(ordering.desc(), _goal.c.id.desc()).limit(limit).subquery()
+        for goal_type in GOAL_TYPES
+    ]
+    ranked = db.union_all(*[db.select(part) for part in parts]).subquery()
+    top = db.session.execute(
+        db.select(ranked.c.goal_type, ranked.c.description, ranked.c.current_value, ranked.c.target_value,
+                  _user.c.username)
+        .join(_user, ranked.c.user_id == _user.c.id)
+        .order_by(ranked.c.goal_type, ranked.c.ordering.desc(), ranked.c.id.desc()))
+
+    types = {}
+    for goal_type, count, completed, average in totals:
+        types[goal_type] = {
+            'goal_type': goal_type, 'total': count, 'completed': completed,
+            'average_progress': round(average * 100, 1) if average is not None else None,
+            'labels': [], 'current_values': [], 'target_values': [],
+        }
+    for goal_type, description, current_value, target_value, username in top:
+        chart = types[goal_type]
+        chart['labels'].append(f'{username}: {description}' if with_usernames else description)
+        chart['current_values'].append(current_value or 0)
+        chart['target_values'].append(target_value)
+
+    # A list, as JSON objects lose the daily-to-yearly order
+    ordered = sorted(types, key=lambda goal_type: (GOAL_TYPES + (goal_type,)).index(goal_type))
+    return {'metric': metric, 'limit': limit, 'status': status,
+            'types': [dict(types[goal_type], shown=len(types[goal_type]['labels'])) for goal_type in ordered]}
@@ -0,0 +1,78 @@
+"""Moves goals from active to completed or failed.
+
+A goal is completed once its current value reaches the target, and failed
+once its end day passes short of it. Nothing else changes the status, so
+``sweep`` catches active goals up in set-based batches, like
+``memberships.sweep``: one indexed SELECT picks up to ``batch_size`` finished
+goal ids and one UPDATE moves them, each batch in its own short transaction.
+Settled goals are never read again by the sweep, and the goal lists and
+charts default to active goals, so their cost follows the live goals rather
+than the history.
+
+Run ``flask goals sweep`` from cron, hourly say. The goal pages also sweep
+once per day per worker, so a missed cron run costs one slower request
+rather than ended goals lingering in the lists.
+"""
+from datetime import datetime
+
+from flask import current_app
+
+from app import db, workout_goals
+from app.models import Goal, goal_running_at
+
+SWEEP_BATCH_SIZE = 5000
+
+_goal = Goal.__table__
+_reached = db.func.coalesce(_goal.c.current_value, 0) >= _goal.c.target_value
+
+
+def _status_case(now):
+    return db.case((_reached, 'completed'), (~goal_running_at(now), 'failed'), else_='active')
+
+
+def _finished(now):
+    """Active goals that reached their target or ran out of time."""
+    # The end date arm is a range scan on ix_goal_status_end_date; the target
+    # arm reads the rest of the active goals, which the sweep keeps few
+    return db.and_(_goal.c.status == 'active', db.or_(~goal_running_at(now), _reached))
+
+
+def _settle(now, *criteria):
+    # The CASE is evaluated by the UPDATE itself, so progress or an edit that
+    # lands after the SELECT is still judged right
+    return db.session.execute(
+        _goal.update().where(_finished(now), *criteria).values(status=_status_case(now), updated_at=now)
+    ).rowcount
+
+
+def sweep(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Move active goals that have finished; return how many moved."""
+    now = now or datetime.utcnow()
+    moved = 0
+    while True:
+        # Read first: an empty sweep never takes the write lock
+        ids = list(db.session.scalars(db.select(_goal.c.id).where(_finished(now)).limit(batch_size)))
+        if not ids:
+            return moved
+        moved += _settle(now, _goal.c.id.in_(ids))
+        db.session.commit()
+
+
+def refresh(goal, now=None):
+    """Judge an edited goal afresh, in the caller's transaction.
+
+    An edit may move the target or the end date, and for workouts goals the
+    progress too, so a settled goal becomes active again until this settles
+    it once more.
+    """
+    now = now or datetime.utcnow()
+    goal.status = 'active'
+    workout_goals.refresh(goal)
+    _settle(now, _goal.c.id == goal.id)
+
+
+def sweep_if_due(today):
+    """Sweep once per day in this worker, before a page lists goals by status."""
+    if current_app.extensions.get('goals_swept_on') != today:
+        sweep()
+        current_app.extensions['goals_swept_on'] = today
@@ -0,0 +1,126 @@
+"""Goal progress pushed in batches by fitness trackers and apps.
+
+A request carries a list of ``{"goal_id", "value", "timestamp"}`` samples.
+``value`` is the goal's new current value (not an increment), and
+``timestamp`` is when it was measured: ISO 8601, read as UTC without an
+offset, and the time the request arrived when left out. Whatever the batch
+size, a request costs one query for the goals, which also settles
+permissions with the rules of the progress form, and one UPDATE executed
+for every goal that changes, in a single transaction.
+
+Goals in ``workouts`` take their progress from attendance (see
+``app.workout_goals``), so samples for them are refused as ``derived``.
+
+Progress is last-write-wins on the measurement time. A sample no newer than
+the goal's ``progress_at`` is ``stale``, and of several samples for one goal
+in a batch only the newest is applied; the others are ``superseded``. The
+UPDATE repeats the time check, so progress written meanwhile by another
+request is never overwritten with older data.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from app import db, workout_goals
+from app.database import fits_integer
+from app.models import Goal
+
+# Built once, like the kiosk check-in statements
+_goal = Goal.__table__
+_GOALS = (
+    db.select(_goal.c.id, _goal.c.user_id, _goal.c.is_admin_set, _goal.c.unit, _goal.c.progress_at)
+    .where(_goal.c.id.in_(db.bindparam('ids', expanding=True)))
+)
+_UPDATE = (
+    _goal.update()
+    .where(_goal.c.id == db.bindparam('goal_id'),
+           db.or_(_goal.c.progress_at == None, _goal.c.progress_at < db.bindparam('measured_at')))
+    .values(current_value=db.bindparam('value'), progress_at=db.bindparam('measured_at'),
+            updated_at=db.bindparam('now'))
+)
+
+
+def can_update(user, goal_user_id, is_admin_set):
+    """Admins may set any goal's progress; members only that of their own goals an admin did not set."""
+    if user.role == 'admin':
+        return True
+    return user.role == 'subscription' and goal_user_id == user.id and not is_admin_set
+
+
+def _parse(item, now, max_skew):
+    if not isinstance(item, dict):
+        raise ValueError('expected a JSON object')
+    goal_id, value = item.get('goal_id'), item.get('value')
+    if not isinstance(goal_id, int) or isinstance(goal_id, bool):
+        raise ValueError('goal_id must be an integer')
+    if not fits_integer(goal_id):
+        raise ValueError('goal_id is out of range')
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value):
+        raise ValueError('value must be a number')
+
+    timestamp = item.get('timestamp')
+    if timestamp is None:
+        return goal_id, float(value), now
+    try:
+        measured_at = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        raise ValueError('timestamp must be an ISO 8601 date and time')
+    if measured_at.tzinfo is not None:
+        measured_at = measured_at.astimezone(timezone.utc).replace(tzinfo=None)
+    # A clock far ahead would otherwise lock out every later sample
+    if measured_at > now + max_skew:
+        raise ValueError('timestamp is in the future')
+    return goal_id, float(value), measured_at
+
+
+def record(items, user, now=None):
+    """Apply a list of progress sample dicts as ``user`` and return one result dict per item."""
+    now = now or datetime.utcnow()
+    max_skew = timedelta(seconds=current_app.config['GOAL_PROGRESS_MAX_CLOCK_SKEW'])
+    results = [None] * len(items)
+    parsed = {}
+    for index, item in enumerate(items):
+        try:
+            parsed[index] = _parse(item, now, max_skew)
+        except ValueError as exc:
+            results[index] = {'status': 'invalid', 'error': str(exc)}
+    if not parsed:
+        return results
+
+    goals = {row.id: row for row in db.session.execute(
+        _GOALS, {'ids': list({goal_id for goal_id, _, _ in parsed.values()})})}
+
+    newest = {}  # goal id -> index of the sample to apply
+    for index, (goal_id, value, measured_at) in parsed.items():
+        goal = goals.get(goal_id)
+        if goal is None:
+            results[index] = {'goal_id': goal_id, 'status': 'not_found'}
+        elif not can_update(user, goal.user_id, goal.is_admin_set):
+            results[index] = {'goal_id': goal_id, 'status': 'forbidden'}
+        elif workout_goals.is_derived(goal.unit):
+            results[index] = {'goal_id': goal_id, 'status': 'derived'}
+        elif goal.progress_at is not None and measured_at <= goal.progress_at:
+            results[index] = {'goal_id': goal_id, 'status': 'stale'}
+        elif goal_id in newest and measured_at < parsed[newest[goal_id]][2]:
+            results[index] = {'goal_id': goal_id, 'status': 'superseded'}
+        else:
+            # Equal times: the later sample in the batch wins
+            if goal_id in newest:
+                results[newest[goal_id]] = {'goal_id': goal_id, 'status': 'superseded'}
+            newest[goal_id] = index
+
+    if newest:
+        rows = [{'goal_id': goal_id, 'value': parsed[index][1], 'measured_at': parsed[index][2], 'now': now}
+                for goal_id, index in newest.items()]
+        updated = db.session.execute(_UPDATE, rows).rowcount
+        written = {goal_id: parsed[index][2] for goal_id, index in newest.items()}
+        if updated != len(rows):
+            # Newer progress landed between the read and the UPDATE (or the
+            # driver cannot count executemany rows): see which ones were ours
+            current = {row.id: row.progress_at for row in db.session.execute(_GOALS, {'ids': list(newest)})}
+            written = {goal_id: at for goal_id, at in written.items() if current.get(goal_id) == at}
+        db.session.commit()
+        for goal_id, index in newest.items():
+            results[index] = {'goal_id': goal_id, 'status': 'updated' if goal_id in written else 'stale'}
+    return results
@@ -0,0 +1,377 @@
+"""Bulk import of members, payments and attendance from CSV or NDJSON.
+
+Rows are read lazily and handled ``batch_size`` at a time. Each batch is
+validated in Python (referenced ids are checked with one ``IN`` query per
+batch), then inserted with a single executemany and committed, so memory and
+transaction size stay bounded however large the file is. Invalid rows are
+skipped and reported by row number; the rest of the batch still goes in.
+
+Columns use the model attribute names:
+
+* members: ``name``, ``email``, ``phone``, ``card_code``, ``join_date``, ``membership_plan_id``,
+  ``membership_start_date``, ``membership_end_date``, ``trainer_id``, ``workout_plan_id``
+* payments: ``member_id``, ``amount``, ``payment_date``, ``plan_id``
+* attendance: ``member_id``, ``check_in_time``, ``check_out_time`` (read as UTC without an offset)
+
+Payments with a ``plan_id`` extend the member's membership exactly like the
+Add Payment form, in file order.
+"""
+import csv
+import json
+from datetime import date, datetime, timezone
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db, metrics, revenue, attendance_analytics, workout_goals
+from app.money import to_minor
+from app.models import (Member, MembershipPlan, Payment, Attendance, Trainer, WorkoutPlan,
+                        membership_after_payment, membership_status)
+
+KINDS = ('members', 'payments', 'attendance')
+FORMATS = ('csv', 'ndjson')
+
+# Keep the report readable (and the upload page small) for a badly broken file
+MAX_REPORTED_ERRORS = 1000
+
+# What a byte that is not UTF-8 decodes to with errors='replace'
+_UNDECODABLE = '\ufffd'
+_NOT_UTF8 = 'not valid UTF-8'
+
+
+class ImportReport:
+    """Counts of imported and rejected rows, with the first few errors."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+    @property
+    def truncated(self):
+        return self.failed > len(self.errors)
+
+
+def detect_format(filename):
+    return 'csv' if filename.lower().endswith('.csv') else 'ndjson'
+
+
+def read_rows(stream, fmt):
+    """Yield ``(row_number, row)`` from a text stream without loading it whole.
+
+    CSV rows are dicts; NDJSON rows are left as text and parsed during
+    validation so a malformed line is reported like any other bad row.
+    Decode the stream with ``errors='replace'``: bytes that are not UTF-8
+    become U+FFFD, and the rows holding them are rejected the same way.
+    """
+    if fmt == 'csv':
+        # Row numbers are file line numbers; line 1 is the header
+        for number, row in enumerate(csv.DictReader(stream), start=2):
+            yield number, row
+    else:
+        for number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield number, line
+
+
+def _as_dict(row):
+    if isinstance(row, dict):
+        if any(_UNDECODABLE in value for value in row.values() if isinstance(value, str)):
+            raise ValueError(_NOT_UTF8)
+        return row
+    if _UNDECODABLE in row:
+        raise ValueError(_NOT_UTF8)
+    try:
+        row = json.loads(row)
+    except ValueError:
+        raise ValueError('not valid JSON')
+    if not isinstance(row, dict):
+        raise ValueError('expected a JSON object')
+    return row
+
+
+def _text(row, key, required=False):
+    value = row.get(key)
+    if value is not None:
+        value = str(value).strip()
+    if not value:
+        if required:
+            raise ValueError(f'{key} is required')
+        return None
+    return value
+
+
+def _int(row, key, required=False):
+    value = _text(row, key, required)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{key} is not a whole number')
+
+
+def _money(row, key, required=False):
+    value = _text(row, key, required)
+    if value is None:
+        return None
+    try:
+        return to_minor(value)
+    except ValueError:
+        raise ValueError(f'{key} is not an amount of money')
+
+
+def _date(row, key, required=False):
+    value = _text(row, key, required)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise ValueError(f'{key} is not a YYYY-MM-DD date')
+
+
+def _datetime(row, key, required=False):
+    value = _text(row, key, required)
+    if value is None:
+        return None
+    try:
+        value = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{key} is not a YYYY-MM-DD HH:MM date and time')
+    # Times are stored as naive UTC; always returning naive values also keeps
+    # check_out_time comparable with check_in_time when only one has an offset
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class _Importer:
+    """Shared batching; subclasses validate rows and write one batch."""
+
+    def __init__(self, report):
+        self.report = report
+        self.member_ids = set()
+
+    def validate(self, row):
+        raise NotImplementedError
+
+    def write(self, rows):
+        """Insert validated ``(row_number, values)`` pairs; return those rejected."""
+        raise NotImplementedError
+
+    def run(self, rows, batch_size):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            valid = []
+            for number, row in batch:
+                try:
+                    valid.append((number, self.validate(_as_dict(row))))
+                except ValueError as exc:
+                    self.report.add_error(number, str(exc))
+            if valid:
+                self._write_batch(valid)
+
+    def _write_batch(self, valid):
+        try:
+            rejected = self.write(valid)
+            db.session.commit()
+        except SQLAlchemyError as exc:
+            db.session.rollback()
+            message = f'batch rolled back: {exc.__class__.__name__}: {getattr(exc, "orig", exc)}'
+            for number, _ in valid:
+                self.report.add_error(number, message)
+            return
+        for number, message in rejected:
+            self.report.add_error(number, message)
+        self.report.inserted += len(valid) - len(rejected)
+
+    def _existing_members(self, values):
+        """Return the member ids among ``values`` that exist, one query per batch."""
+        unknown = {value['member_id'] for value in values} - self.member_ids
+        if unknown:
+            self.member_ids.update(db.session.scalars(db.select(Member.id).where(Member.id.in_(unknown))))
+        return self.member_ids
+
+
+def _ids(model):
+    return set(db.session.scalars(db.select(model.id)))
+
+
+class _MemberImporter(_Importer):
+    def __init__(self, report):
+        super().__init__(report)
+        self.plan_ids = _ids(MembershipPlan)
+        self.trainer_ids = _ids(Trainer)
+        self.workout_plan_ids = _ids(WorkoutPlan)
+        self.today = datetime.utcnow().date()
+
+    def validate(self, row):
+        values = {
+            'name': _text(row, 'name', required=True),
+            'email': _text(row, 'email', required=True),
+            'phone': _text(row, 'phone'),
+            'card_code': _text(row, 'card_code'),
+            'join_date': _date(row, 'join_date') or self.today,
+            'membership_plan_id': _int(row, 'membership_plan_id'),
+            'membership_start_date': _date(row, 'membership_start_date'),
+            'membership_end_date': _date(row, 'membership_end_date'),
+            'trainer_id': _int(row, 'trainer_id'),
+            'workout_plan_id': _int(row, 'workout_plan_id'),
+        }
+        if '@' not in values['email']:
+            raise ValueError('email is not a valid address')
+        values['membership_status'] = membership_status(values['membership_end_date'], self.today)
+        for key, known in (('membership_plan_id', self.plan_ids), ('trainer_id', self.trainer_ids),
+                           ('workout_plan_id', self.workout_plan_ids)):
+            if values[key] is not None and values[key] not in known:
+                raise ValueError(f'{key} {values[key]} does not exist')
+        return values
+
+    def write(self, rows):
+        emails = {values['email'] for _, values in rows}
+        cards = {values['card_code'] for _, values in rows if values['card_code']}
+        taken = set(db.session.scalars(db.select(Member.email).where(Member.email.in_(emails))))
+        taken_cards = set(db.session.scalars(db.select(Member.card_code).where(Member.card_code.in_(cards))))
+        accepted, rejected = [], []
+        for number, values in rows:
+            if values['email'] in taken:
+                rejected.append((number, f'email {values["email"]} is already in use'))
+            elif values['card_code'] in taken_cards:
+                rejected.append((number, f'card_code {values["card_code"]} is already in use'))
+            else:
+                taken.add(values['email'])
+                if values['card_code']:
+                    taken_cards.add(values['card_code'])
+                accepted.append(values)
+        if accepted:
+            db.session.execute(db.insert(Member.__table__), accepted)
+            metrics.increment('total_members', len(accepted))
+            metrics.increment('active_members',
+                              sum(metrics.is_active(values['membership_end_date'], self.today)
+                                  for values in accepted))
+        return rejected
+
+
+class _PaymentImporter(_Importer):
+    def __init__(self, report):
+        super().__init__(report)
+        self.plan_days = dict(db.session.execute(db.select(MembershipPlan.id, MembershipPlan.duration_days)).all())
+        self.today = datetime.utcnow().date()
+
+    def validate(self, row):
+        values = {
+            'member_id': _int(row, 'member_id', required=True),
+            'amount_cents': _money(row, 'amount', required=True),
+            'payment_date': _date(row, 'payment_date') or self.today,
+            'plan_id': _int(row, 'plan_id'),
+        }
+        if values['amount_cents'] < 0:
+            raise ValueError('amount must not be negative')
+        if values['plan_id'] is not None and values['plan_id'] not in self.plan_days:
+            raise ValueError(f'plan_id {values["plan_id"]} does not exist')
+        return values
+
+    def write(self, rows):
+        member_ids = {values['member_id'] for _, values in rows}
+        memberships, trainers = {}, {}
+        for member_id, start, end, trainer_id in db.session.execute(
+                db.select(Member.id, Member.membership_start_date, Member.membership_end_date, Member.trainer_id)
+                .where(Member.id.in_(member_ids))):
+            memberships[member_id] = (start, end)
+            trainers[member_id] = trainer_id
+        original_ends = {member_id: end for member_id, (_, end) in memberships.items()}
+        accepted, rejected = [], []
+        for number, values in rows:
+            membership = memberships.get(values['member_id'])
+            if membership is None:
+                rejected.append((number, f'member_id {values["member_id"]} does not exist'))
+                continue
+            if values['plan_id'] is not None:
+                memberships[values['member_id']] = membership_after_payment(
+                    *membership, values['payment_date'], self.plan_days[values['plan_id']])
+            accepted.append(values)
+        if not accepted:
+            return rejected
+
+        db.session.execute(db.insert(Payment.__table__), accepted)
+        changed = [
+            {'b_id': member_id, 'b_start': start, 'b_end': end, 'b_status': membership_status(end, self.today)}
+            for member_id, (start, end) in memberships.items()
+            if end != original_ends[member_id]
+        ]
+        if changed:
+            member = Member.__table__
+            db.session.execute(
+                member.update().where(member.c.id == db.bindparam('b_id'))
+                .values(membership_start_date=db.bindparam('b_start'),
+                        membership_end_date=db.bindparam('b_end'),
+                        membership_status=db.bindparam('b_status')),
+                changed,
+            )
+        metrics.increment('total_revenue_cents', sum(values['amount_cents'] for values in accepted))
+        revenue.record((values['payment_date'], values['plan_id'], trainers[values['member_id']],
+                        values['amount_cents']) for values in accepted)
+        metrics.increment('active_members', sum(
+            int(metrics.is_active(change['b_end'], self.today))
+            - int(metrics.is_active(original_ends[change['b_id']], self.today))
+            for change in changed
+        ))
+        return rejected
+
+
+class _AttendanceImporter(_Importer):
+    def validate(self, row):
+        values = {
+            'member_id': _int(row, 'member_id', required=True),
+            'check_in_time': _datetime(row, 'check_in_time', required=True),
+            'check_out_time': _datetime(row, 'check_out_time'),
+        }
+        if values['check_out_time'] and values['check_out_time'] < values['check_in_time']:
+            raise ValueError('check_out_time is before check_in_time')
+        return values
+
+    def write(self, rows):
+        existing = self._existing_members([values for _, values in rows])
+        accepted, rejected = [], []
+        for number, values in rows:
+            if values['member_id'] in existing:
+                accepted.append(values)
+            else:
+                rejected.append((number, f'member_id {values["member_id"]} does not exist'))
+        if accepted:
+            db.session.execute(db.insert(Attendance.__table__), accepted)
+            metrics.increment('total_checkins', len(accepted))
+            workout_goals.advance(db.session)
+        return rejected
+
+
+_IMPORTERS = {
+    'members': _MemberImporter,
+    'payments': _PaymentImporter,
+    'attendance': _AttendanceImporter,
+}
+
+
+def import_rows(kind, rows, batch_size=None):
+    """Import ``(row_number, row)`` pairs of ``kind`` and return an ImportReport."""
+    report = ImportReport()
+    _IMPORTERS[kind](report).run(rows, batch_size or current_app.config['IMPORT_BATCH_SIZE'])
+    if kind == 'attendance' and report.inserted:
+        # Imports are mostly history: every cached day may have changed
+        attendance_analytics.clear()
+    report.errors.sort()
+    return report
+
+
+def import_stream(kind, stream, fmt, batch_size=None):
+    return import_rows(kind, read_rows(stream, fmt), batch_size)
@@ -0,0 +1,91 @@
+"""Keeps ``Member.membership_status`` in step with the calendar.
+
+Setting ``membership_end_date`` through the ORM recomputes the status (see
+``Member._update_membership_status``), so the payment, add and edit routes
+store the right value straight away. Memberships also move from active to
+expiring to expired simply because days pass; ``sweep`` catches those rows
+up. It works in set-based batches: one indexed SELECT picks up to
+``batch_size`` stale member ids and one UPDATE moves them, each batch in its
+own short transaction.
+
+Run ``flask memberships sweep`` from cron just after midnight. Pages that
+filter or count on the status also sweep once per day per worker, so a
+missed cron run costs one slower request rather than stale lists.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models import Member, MEMBERSHIP_EXPIRING_DAYS
+
+SWEEP_BATCH_SIZE = 5000
+
+_member = Member.__table__
+
+
+def _status_case(today):
+    end_date = _member.c.membership_end_date
+    return db.case(
+        (end_date == None, 'none'),
+        (end_date < today, 'expired'),
+        (end_date <= today + timedelta(days=MEMBERSHIP_EXPIRING_DAYS), 'expiring'),
+        else_='active',
+    )
+
+
+def _aged(today):
+    """Rows whose stored status the passing of time has overtaken."""
+    status, end_date = _member.c.membership_status, _member.c.membership_end_date
+    # Both arms are range scans on ix_member_membership_status_end_date
+    return db.or_(
+        db.and_(status == 'active', end_date <= today + timedelta(days=MEMBERSHIP_EXPIRING_DAYS)),
+        db.and_(status == 'expiring', end_date < today),
+    )
+
+
+def _update(ids, today):
+    db.session.execute(_member.update().where(_member.c.id.in_(ids)).values(membership_status=_status_case(today)))
+    db.session.commit()
+
+
+def sweep(today=None, batch_size=SWEEP_BATCH_SIZE):
+    """Move members whose status has aged since it was stored; return how many moved."""
+    today = today or datetime.utcnow().date()
+    moved = 0
+    while True:
+        # Read first: an empty sweep never takes the write lock
+        ids = list(db.session.scalars(db.select(_member.c.id).where(_aged(today)).limit(batch_size)))
+        if not ids:
+            return moved
+        _update(ids, today)
+        moved += len(ids)
+
+
+def recompute(today=None, batch_size=SWEEP_BATCH_SIZE):
+    """Recompute every member's status in id-range batches; return how many changed.
+
+    For after a restore, a bulk load or manual SQL that skipped the ORM.
+    """
+    today = today or datetime.utcnow().date()
+    target = _status_case(today)
+    changed = 0
+    last_id = 0
+    max_id = db.session.scalar(db.select(db.func.max(_member.c.id))) or 0
+    while last_id < max_id:
+        upto = last_id + batch_size
+        changed += db.session.execute(
+            _member.update()
+            .where(_member.c.id > last_id, _member.c.id <= upto, _member.c.membership_status != target)
+            .values(membership_status=target)
+        ).rowcount
+        db.session.commit()
+        last_id = upto
+    return changed
+
+
+def sweep_if_due(today):
+    """Sweep once per day in this worker, before a page filters on the status."""
+    if current_app.extensions.get('membership_swept_on') != today:
+        sweep(today)
+        current_app.extensions['membership_swept_on'] = today
@@ -0,0 +1,103 @@
+"""Running counters behind the dashboard, kept in the ``gym_metrics`` table.
+
+Routes adjust the counters with ``increment`` inside the same transaction as
+the change that caused them, so reading a metric is a primary-key lookup
+instead of an aggregate over the source table. ``flask metrics check``
+compares them with the live aggregates and ``flask metrics rebuild`` resets
+them.
+"""
+from datetime import datetime
+
+from app import db
+from app.models import Member, Payment, Attendance, Inquiry, GymMetric
+
+# Revenue is kept in cents (see app.money) so that it sums exactly
+COUNTERS = ('total_members', 'active_members', 'total_revenue_cents', 'total_checkins', 'total_inquiries')
+
+
+def live_values(today=None):
+    """Compute every counter from the source tables in one round trip."""
+    today = today or datetime.utcnow().date()
+
+    def count(model, *criteria):
+        return db.select(db.func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+    row = db.session.execute(db.select(
+        count(Member).label('total_members'),
+        count(Member, Member.membership_end_date >= today).label('active_members'),
+        db.select(db.func.coalesce(db.func.sum(Payment.amount_cents), 0)).scalar_subquery().label('total_revenue_cents'),
+        count(Attendance).label('total_checkins'),
+        count(Inquiry).label('total_inquiries'),
+    )).one()
+    return {name: int(value) for name, value in row._asdict().items()}
+
+
+def read():
+    return {metric.name: metric.value for metric in GymMetric.query.all()}
+
+
+def add(connection, name, delta):
+    """Add ``delta`` to a counter through ``connection`` and return the rows updated."""
+    # A plain table UPDATE: the ORM-enabled form spends longer synchronizing
+    # the session than the statement takes to run
+    table = GymMetric.__table__
+    return connection.execute(
+        table.update().where(table.c.name == name)
+        .values(value=table.c.value + delta, updated_at=datetime.utcnow())
+    ).rowcount
+
+
+def increment(name, delta=1):
+    """Add ``delta`` to a counter as part of the current transaction."""
+    if not delta:
+        return
+    if add(db.session, name, delta) == 0:
+        # First write since the table was created: start from the live value,
+        # which already includes this change because the session has flushed.
+        db.session.add(GymMetric(name=name, value=live_values()[name],
+                                 computed_on=datetime.utcnow().date()))
+
+
+def is_active(end_date, today=None):
+    return end_date is not None and end_date >= (today or datetime.utcnow().date())
+
+
+def track_membership_change(old_end_date, new_end_date):
+    """Adjust ``active_members`` when a member's end date changes."""
+    increment('active_members', int(is_active(new_end_date)) - int(is_active(old_end_date)))
+
+
+def refresh_active_members(today):
+    """Recount active members once per day, when memberships lapse."""
+    metric = db.session.get(GymMetric, 'active_members')
+    if metric is None or metric.computed_on != today:
+        value = live_values(today)['active_members']
+        if metric is None:
+            db.session.add(GymMetric(name='active_members', value=value, computed_on=today))
+        else:
+            metric.value = value
+            metric.computed_on = today
+        db.session.commit()
+
+
+def rebuild(today=None):
+    """Overwrite every counter with the live aggregates and return them."""
+    today = today or datetime.utcnow().date()
+    values = live_values(today)
+    for name, value in values.items():
+        metric = db.session.get(GymMetric, name)
+        if metric is None:
+            db.session.add(GymMetric(name=name, value=value, computed_on=today))
+        else:
+            metric.value = value
+            metric.computed_on = today
+    db.session.commit()
+    return values
+
+
+def drift(today=None):
+    """Return ``{name: (stored, live)}`` for every counter that disagrees."""
+    stored = read()
+    live = live_values(today)
+    return {name: (stored.get(name), value) for name, value in live.items()
+            if stored.get(name) != value}
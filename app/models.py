@@ -1,17 +1,52 @@
 from datetime import datetime, timedelta
 from app import db, bcrypt # Import bcrypt
+from app.money import to_minor, from_minor
 from flask_login import UserMixin # Import UserMixin
 
+def membership_after_payment(start_date, end_date, payment_date, duration_days):
+    """Return the (start, end) dates of a membership after paying for a plan.
+
+    An unexpired membership is extended; a new or lapsed one restarts on the
+    payment date.
+    """
+    if start_date and end_date and end_date >= payment_date:
+        return start_date, end_date + timedelta(days=duration_days)
+    return payment_date, payment_date + timedelta(days=duration_days)
+
+# Memberships ending within this many days (inclusive) show as expiring
+MEMBERSHIP_EXPIRING_DAYS = 7
+MEMBERSHIP_STATUSES = ('active', 'expiring', 'expired', 'none')
+# Statuses that still allow check-ins, and those listed as expired/inactive
+CURRENT_STATUSES = ('active', 'expiring')
+LAPSED_STATUSES = ('expired', 'none')
+# Goals start active; app.goal_lifecycle settles them as completed or failed
+GOAL_STATUSES = ('active', 'completed', 'failed')
+
+def membership_status(end_date, today=None):
+    """Return the stored ``membership_status`` for a membership ending on ``end_date``."""
+    if end_date is None:
+        return 'none'
+    today = today or datetime.utcnow().date()
+    if end_date < today:
+        return 'expired'
+    if end_date <= today + timedelta(days=MEMBERSHIP_EXPIRING_DAYS):
+        return 'expiring'
+    return 'active'
+
 class Member(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     phone = db.Column(db.String(20))
+    card_code = db.Column(db.String(32)) # Access card scanned at the kiosks
     join_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     
     membership_plan_id = db.Column(db.Integer, db.ForeignKey('membership_plan.id'))
     membership_start_date = db.Column(db.Date)
     membership_end_date = db.Column(db.Date)
+    # Derived from membership_end_date on every change and moved along by
+    # `flask memberships sweep` as days pass, so lists filter on an index
+    membership_status = db.Column(db.String(10), nullable=False, default='none', server_default='none')
     
     trainer_id = db.Column(db.Integer, db.ForeignKey('trainer.id'))
     workout_plan_id = db.Column(db.Integer, db.ForeignKey('workout_plan.id'))
@@ -19,6 +54,27 @@ class Member(db.Model):
     payments = db.relationship('Payment', backref='member', lazy='dynamic')
     attendances = db.relationship('Attendance', backref='member', lazy='dynamic')
 
+    __table_args__ = (
+        db.Index('ix_member_name', 'name'),
+        db.Index('ix_member_membership_end_date', 'membership_end_date'),
+        db.Index('ix_member_card_code', 'card_code', unique=True),
+        db.Index('ix_member_membership_status_name', 'membership_status', 'name', 'id'),
+        db.Index('ix_member_membership_status_end_date', 'membership_status', 'membership_end_date'),
+        # Utilization reports group on these; the deletes check them for members
+        db.Index('ix_member_trainer_id_membership_status', 'trainer_id', 'membership_status'),
+        db.Index('ix_member_membership_plan_id_membership_status', 'membership_plan_id', 'membership_status'),
+        db.Index('ix_member_workout_plan_id_membership_status', 'workout_plan_id', 'membership_status'),
+    )
+
+    @db.validates('membership_end_date')
+    def _update_membership_status(self, key, end_date):
+        self.membership_status = membership_status(end_date)
+        return end_date
+
+    def apply_plan_payment(self, plan, payment_date):
+        self.membership_start_date, self.membership_end_date = membership_after_payment(
+            self.membership_start_date, self.membership_end_date, payment_date, plan.duration_days)
+
     def is_membership_active(self):
         if self.membership_end_date:
             return self.membership_end_date >= datetime.utcnow().date()
@@ -27,6 +83,9 @@ class Member(db.Model):
     def __repr__(self):
         return f'<Member {self.name}>'
 
+# Case-insensitive prefix search for the member typeahead
+db.Index('ix_member_name_lower', db.func.lower(Member.name))
+
 class MembershipPlan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False, unique=True)
@@ -41,20 +100,62 @@ class MembershipPlan(db.Model):
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     member_id = db.Column(db.Integer, db.ForeignKey('member.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount_cents = db.Column(db.Integer, nullable=False) # Minor units; use .amount for a Decimal
     payment_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     plan_id = db.Column(db.Integer, db.ForeignKey('membership_plan.id'))
 
     plan = db.relationship('MembershipPlan')
 
+    __table_args__ = (
+        db.Index('ix_payment_payment_date', 'payment_date'),
+        db.Index('ix_payment_member_id_payment_date', 'member_id', 'payment_date'),
+    )
+
+    @property
+    def amount(self):
+        return from_minor(self.amount_cents) if self.amount_cents is not None else None
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_minor(value)
+
     def __repr__(self):
         return f'<Payment {self.id}>'
 
+class RevenueMonth(db.Model):
+    """Payments summed per calendar month, plan and trainer, kept up to date as they are recorded.
+
+    The trainer is the member's trainer when the payment was made. Plans and
+    trainers are not foreign keys: deleting one must not touch past revenue.
+    """
+    __tablename__ = 'revenue_month'
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Date, nullable=False) # First day of the month
+    plan_id = db.Column(db.Integer)
+    trainer_id = db.Column(db.Integer)
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_cents = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<RevenueMonth {self.month} plan={self.plan_id} trainer={self.trainer_id}>'
+
+# One row per month/plan/trainer; NULL (no plan, no trainer) counts as a key value
+db.Index('ix_revenue_month_key', RevenueMonth.month, db.func.coalesce(RevenueMonth.plan_id, 0),
+         db.func.coalesce(RevenueMonth.trainer_id, 0), unique=True)
+
 class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     member_id = db.Column(db.Integer, db.ForeignKey('member.id'), nullable=False)
     check_in_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     check_out_time = db.Column(db.DateTime)
+    idempotency_key = db.Column(db.String(64)) # Sent by kiosks so a retried check-in is recorded once
+
+    __table_args__ = (
+        db.Index('ix_attendance_check_in_time', 'check_in_time'),
+        db.Index('ix_attendance_member_id_check_in_time', 'member_id', 'check_in_time'),
+        db.Index('ix_attendance_idempotency_key', 'idempotency_key', unique=True),
+    )
 
     def __repr__(self):
         return f'<Attendance for Member {self.member_id} at {self.check_in_time}>'
@@ -89,6 +190,10 @@ class Inquiry(db.Model):
     message = db.Column(db.Text)
     submitted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_inquiry_submitted_at', 'submitted_at'),
+    )
+
     def __repr__(self):
         return f'<Inquiry {self.name}>'
 
@@ -103,6 +208,11 @@ class User(db.Model, UserMixin):
 
     goals = db.relationship('Goal', backref='author', lazy='dynamic')
 
+    __table_args__ = (
+        # Check-ins find their member's user through this (see app.workout_goals)
+        db.Index('ix_user_member_id', 'member_id'),
+    )
+
     def set_password(self, password):
         self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
 
@@ -112,6 +222,8 @@ class User(db.Model, UserMixin):
     def __repr__(self):
         return f'<User {self.username}>'
 
+db.Index('ix_user_username_lower', db.func.lower(User.username))
+
 class Goal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -127,8 +239,43 @@ class Goal(db.Model):
     status = db.Column(db.String(20), default='active') # e.g., 'active', 'completed', 'failed'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # When current_value was measured; progress measured earlier is ignored (last write wins)
+    progress_at = db.Column(db.DateTime)
 
     user = db.relationship('User', backref=db.backref('goals_set', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_goal_end_date', 'end_date'),
+        db.Index('ix_goal_user_id_end_date', 'user_id', 'end_date'),
+        # Goal charts total and rank each goal type from these, for everyone or one user
+        db.Index('ix_goal_goal_type_target_value_current_value', 'goal_type', 'target_value', 'current_value'),
+        db.Index('ix_goal_user_id_goal_type', 'user_id', 'goal_type'),
+        # The lifecycle sweep and the default (active) goal lists read these
+        db.Index('ix_goal_status_end_date', 'status', 'end_date'),
+    )
+
+    def __repr__(self):
+        return f'<Goal {self.description} for User {self.user_id}>'
+
+def goal_running_at(moment):
+    """SQL criterion: a goal has not ended by ``moment``, a datetime or a datetime column.
+
+    The goal forms store the end date as midnight of the last day, and a goal
+    runs through the whole of that day, up to midnight of the next.
+    """
+    end_date = Goal.__table__.c.end_date
+    if isinstance(moment, datetime):
+        # A range on end_date, so the status/end date index still serves it
+        return end_date >= datetime.combine(moment.date(), datetime.min.time())
+    return db.func.date(moment) <= db.func.date(end_date)
+
+class GymMetric(db.Model):
+    __tablename__ = 'gym_metrics'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    computed_on = db.Column(db.Date) # Last time the value was rebuilt from the source tables
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
     def __repr__(self):
-        return f'<Goal {self.description} for User {self.user_id}>'
\ No newline at end of file
+        return f'<GymMetric {self.name}={self.value}>'
@@ -0,0 +1,24 @@
+"""Money amounts are stored as integer minor units (cents).
+
+Floats cannot represent most decimal amounts exactly, and the error grows as
+thousands of payments are summed. Integers sum exactly in SQL, and
+``Decimal`` is used wherever an amount is shown or parsed.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+MINOR_UNITS = 100
+_CENT = Decimal('0.01')
+
+
+def to_minor(amount):
+    """Convert an amount in major units (Decimal, str, int or float) to an int of cents."""
+    try:
+        value = Decimal(str(amount)).quantize(_CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f'{amount!r} is not an amount of money')
+    return int(value * MINOR_UNITS)
+
+
+def from_minor(minor):
+    """Convert cents to a Decimal in major units, e.g. 3050 -> Decimal('30.50')."""
+    return (Decimal(int(minor or 0)) / MINOR_UNITS).quantize(_CENT)
@@ -0,0 +1,122 @@
+import base64
+import json
+from datetime import date, datetime
+
+from flask import abort, current_app, request
+from app import db
+from app.database import fits_integer
+
+
+class KeysetPage:
+    """One page of a keyset-paginated query plus the cursors around it."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, per_page=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    value = python_type(value)
+    if python_type is int and not fits_integer(value):
+        raise ValueError('cursor value out of range')
+    return value
+
+
+def encode_cursor(item, columns):
+    values = [_encode_value(getattr(item, column.key)) for column in columns]
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if len(values) != len(columns):
+            raise ValueError('cursor does not match sort key')
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError, OverflowError):
+        abort(400)
+
+
+def get_per_page():
+    default = current_app.config['ITEMS_PER_PAGE']
+    maximum = current_app.config['MAX_ITEMS_PER_PAGE']
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, maximum))
+
+
+def keyset_paginate(query, columns, descending=False, cursor=None, direction='next', per_page=None):
+    """Return a KeysetPage for ``query`` ordered by ``columns``.
+
+    ``columns`` must form a unique sort key (end it with the primary key) so
+    every row has exactly one position. Instead of OFFSET, the page is found by
+    comparing the sort key against the cursor, which lets the database seek
+    straight to it through an index on the same columns.
+    """
+    per_page = per_page or get_per_page()
+    backwards = direction == 'prev'
+    # Walking backwards through a descending list is an ascending scan.
+    scan_descending = descending != backwards
+
+    if cursor:
+        key = db.tuple_(*columns)
+        values = db.tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(key < values if scan_descending else key > values)
+
+    order = [column.desc() if scan_descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+
+    # Coming from a cursor means there is at least one row on that side of it.
+    if backwards:
+        has_next, has_prev = bool(cursor), has_more
+    else:
+        has_next, has_prev = has_more, bool(cursor)
+
+    next_cursor = prev_cursor = None
+    if items:
+        if has_next:
+            next_cursor = encode_cursor(items[-1], columns)
+        if has_prev:
+            prev_cursor = encode_cursor(items[0], columns)
+
+    return KeysetPage(items, next_cursor, prev_cursor, per_page)
+
+
+def paginate_from_request(query, columns, descending=False):
+    return keyset_paginate(
+        query, columns, descending=descending,
+        cursor=request.args.get('cursor'),
+        direction=request.args.get('direction', 'next'),
+    )
@@ -0,0 +1,163 @@
+"""Password checks on a small, bounded thread pool.
+
+bcrypt is slow on purpose (about 0.3 s per check at the default cost of 12),
+and it releases the GIL while it runs. Left on the request threads, a burst of
+logins takes every CPU on the host and the rest of the site stalls behind it.
+Instead, at most ``PASSWORD_CHECK_WORKERS`` checks run at once per process and
+up to ``PASSWORD_CHECK_QUEUE`` more wait their turn. A login that finds the
+queue full, or waits longer than ``PASSWORD_CHECK_TIMEOUT`` seconds, is told
+to try again (HTTP 503) rather than piling up.
+
+The pool bounds CPU, not request workers: a login waiting for its turn still
+holds its request thread for up to ``PASSWORD_CHECK_TIMEOUT``. With threaded
+workers (e.g. gunicorn ``--threads``) other requests carry on meanwhile; with
+sync workers a login storm can still occupy every worker, so lower the
+timeout towards the p99 of one check.
+
+A successful login whose hash was made with a different cost than
+``BCRYPT_LOG_ROUNDS`` is rehashed at the current cost, so raising (or
+lowering) the work factor takes effect as people sign in.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import current_app
+
+from app import db, bcrypt
+
+# Recent timings kept for the percentiles in ``stats()``
+SAMPLE_SIZE = 1000
+
+
+class PasswordCheckBusy(Exception):
+    """Raised when the check queue is full or the wait timed out."""
+
+
+def hash_cost(password_hash):
+    """Return the bcrypt cost of ``$2b$12$...``, or None if it is not a bcrypt hash."""
+    parts = (password_hash or '').split('$')
+    if len(parts) != 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class PasswordChecker:
+
+    def __init__(self, workers=2, queue=16, timeout=5.0):
+        self.workers = workers
+        self.queue = queue
+        self.timeout = timeout
+        # One slot per running or waiting check; released when the check ends
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.checks = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.rehashed = 0
+        self.queue_times = deque(maxlen=SAMPLE_SIZE)
+        self.run_times = deque(maxlen=SAMPLE_SIZE)
+
+    def _pool(self):
+        # Threads do not survive a fork: each worker process gets its own pool
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-check')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _count(self, counter):
+        # Request threads update the counters concurrently
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise PasswordCheckBusy()
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.queue_times.append(started - submitted)
+                    self.run_times.append(finished - started)
+
+        try:
+            future = self._pool().submit(timed)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Drop it if it has not started; a running check finishes unseen
+            future.cancel()
+            self._count('timed_out')
+            raise PasswordCheckBusy()
+
+    def check(self, password_hash, password):
+        self._count('checks')
+        return self._run(bcrypt.check_password_hash, password_hash, password)
+
+    def generate(self, password):
+        return self._run(bcrypt.generate_password_hash, password).decode('utf-8')
+
+    def stats(self):
+        with self._lock:
+            queue_times, run_times = list(self.queue_times), list(self.run_times)
+
+        def ms(values, fraction):
+            value = _percentile(values, fraction)
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            'workers': self.workers, 'queue': self.queue, 'checks': self.checks,
+            'rejected': self.rejected, 'timed_out': self.timed_out, 'rehashed': self.rehashed,
+            'queue_ms': {'p50': ms(queue_times, 0.5), 'p95': ms(queue_times, 0.95),
+                         'p99': ms(queue_times, 0.99), 'max': ms(queue_times, 1)},
+            'run_ms': {'p50': ms(run_times, 0.5), 'p99': ms(run_times, 0.99)},
+        }
+
+
+def verify_login(user, password):
+    """Check ``password`` for ``user`` and bring the hash up to the current cost.
+
+    Raises PasswordCheckBusy when the check could not run in time. The rehash
+    is best effort: if the pool is busy it happens on a later login.
+    """
+    checker = current_app.extensions['password_checker']
+    if not checker.check(user.password_hash, password):
+        return False
+    if hash_cost(user.password_hash) != current_app.config['BCRYPT_LOG_ROUNDS']:
+        try:
+            user.password_hash = checker.generate(password)
+        except PasswordCheckBusy:
+            return True
+        db.session.commit()
+        checker._count('rehashed')
+    return True
+
+
+def init_app(app):
+    app.extensions['password_checker'] = PasswordChecker(
+        workers=app.config['PASSWORD_CHECK_WORKERS'],
+        queue=app.config['PASSWORD_CHECK_QUEUE'],
+        timeout=app.config['PASSWORD_CHECK_TIMEOUT'],
+    )
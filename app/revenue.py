@@ -0,0 +1,154 @@
+"""Revenue reports, served from the ``revenue_month`` rollup.
+
+Every recorded payment adds its amount to one rollup row per calendar month,
+plan and trainer, in the same transaction as the payment. A report then
+reads a few hundred rollup rows, however many payments there are, and sums
+them by period (month, quarter or year) and by plan or trainer. The rollup
+has whole months, so report ranges are widened to whole months.
+
+``flask revenue check`` compares the rollup with the payments table and
+``flask revenue rebuild`` recomputes it. A rebuild attributes past payments
+to the member's current trainer, since the trainer at payment time is not
+kept anywhere else.
+"""
+from collections import defaultdict
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db, choices
+from app.models import Payment, Member, RevenueMonth
+from app.money import from_minor
+
+PERIODS = ('month', 'quarter', 'year')
+GROUPS = ('plan', 'trainer', 'none')
+
+_rollup = RevenueMonth.__table__
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def _period_label(month, period):
+    if period == 'year':
+        return f'{month.year}'
+    if period == 'quarter':
+        return f'{month.year}-Q{(month.month - 1) // 3 + 1}'
+    return f'{month:%Y-%m}'
+
+
+def _add(month, plan_id, trainer_id, payments, amount_cents):
+    key = (_rollup.c.month == month,
+           db.func.coalesce(_rollup.c.plan_id, 0) == (plan_id or 0),
+           db.func.coalesce(_rollup.c.trainer_id, 0) == (trainer_id or 0))
+    update = _rollup.update().where(*key).values(payment_count=_rollup.c.payment_count + payments,
+                                                 amount_cents=_rollup.c.amount_cents + amount_cents)
+    if db.session.execute(update).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(_rollup.insert().values(month=month, plan_id=plan_id, trainer_id=trainer_id,
+                                                       payment_count=payments, amount_cents=amount_cents))
+    except IntegrityError:
+        # Another worker created the row after our update missed it
+        db.session.execute(update)
+
+
+def record(payments):
+    """Add ``(payment_date, plan_id, trainer_id, amount_cents)`` tuples to the rollup.
+
+    Runs in the current transaction; commit it together with the payments.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for payment_date, plan_id, trainer_id, amount_cents in payments:
+        total = totals[(month_of(payment_date), plan_id, trainer_id)]
+        total[0] += 1
+        total[1] += amount_cents
+    for (month, plan_id, trainer_id), (count, amount_cents) in totals.items():
+        _add(month, plan_id, trainer_id, count, amount_cents)
+
+
+def _month_start(column):
+    if db.engine.dialect.name == 'sqlite':
+        return db.func.date(column, 'start of month')
+    return db.cast(db.func.date_trunc('month', column), db.Date)
+
+
+def _live():
+    """The rollup as computed from the payments table."""
+    month = _month_start(Payment.payment_date).label('month')
+    return (
+        db.select(month, Payment.plan_id, Member.trainer_id,
+                  db.func.count().label('payment_count'), db.func.sum(Payment.amount_cents).label('amount_cents'))
+        .join(Member, Payment.member_id == Member.id)
+        .group_by(month, Payment.plan_id, Member.trainer_id)
+    )
+
+
+def rebuild():
+    """Recompute the rollup from every payment; return the number of rows."""
+    db.session.execute(_rollup.delete())
+    db.session.execute(_rollup.insert().from_select(
+        ['month', 'plan_id', 'trainer_id', 'payment_count', 'amount_cents'], _live()))
+    db.session.commit()
+    return db.session.scalar(db.select(db.func.count()).select_from(_rollup))
+
+
+def drift():
+    """Return ``{(month, plan_id, trainer_id): (stored, live)}`` for every disagreeing row.
+
+    Compares per month and plan only: trainers may have changed since.
+    """
+    def totals(rows):
+        result = defaultdict(lambda: (0, 0))
+        for month, plan_id, count, amount_cents in rows:
+            key = (str(month), plan_id)
+            result[key] = (result[key][0] + count, result[key][1] + amount_cents)
+        return result
+
+    stored = totals(db.session.execute(
+        db.select(_rollup.c.month, _rollup.c.plan_id, _rollup.c.payment_count, _rollup.c.amount_cents)))
+    live_rows = _live().subquery()
+    live = totals(db.session.execute(
+        db.select(live_rows.c.month, live_rows.c.plan_id, live_rows.c.payment_count, live_rows.c.amount_cents)))
+    return {key: (stored.get(key), live.get(key)) for key in stored.keys() | live.keys()
+            if stored.get(key) != live.get(key)}
+
+
+def report(start=None, end=None, period='month', group='plan'):
+    """Revenue between the months of ``start`` and ``end`` (dates), by period and plan or trainer."""
+    dimension = {'plan': _rollup.c.plan_id, 'trainer': _rollup.c.trainer_id}.get(group)
+    columns = [_rollup.c.month] + ([dimension] if dimension is not None else [])
+    statement = (
+        db.select(*columns, db.func.sum(_rollup.c.payment_count), db.func.sum(_rollup.c.amount_cents))
+        .group_by(*columns).order_by(*columns)
+    )
+    if start:
+        statement = statement.where(_rollup.c.month >= month_of(start))
+    if end:
+        statement = statement.where(_rollup.c.month <= month_of(end))
+
+    totals = defaultdict(lambda: [0, 0])
+    for row in db.session.execute(statement):
+        key = (_period_label(row[0], period), row[1] if dimension is not None else None)
+        totals[key][0] += row[-2]
+        totals[key][1] += row[-1]
+
+    names = dict(choices.plan_choices() if group == 'plan' else choices.trainer_choices() if group == 'trainer' else [])
+    unassigned = {'plan': 'No plan', 'trainer': 'No trainer'}.get(group)
+    rows = []
+    for (label, key), (count, amount_cents) in totals.items():
+        row = {'period': label, 'payments': count, 'amount_cents': amount_cents,
+               'amount': str(from_minor(amount_cents))}
+        if dimension is not None:
+            row[f'{group}_id'] = key
+            row[group] = unassigned if key is None else names.get(key, f'Deleted {group} #{key}')
+        rows.append(row)
+    total_cents = sum(row['amount_cents'] for row in rows)
+    return {
+        'period': period, 'group': group,
+        'start': f'{month_of(start):%Y-%m}' if start else None, 'end': f'{month_of(end):%Y-%m}' if end else None,
+        'rows': rows,
+        'total': {'payments': sum(row['payments'] for row in rows), 'amount_cents': total_cents,
+                  'amount': str(from_minor(total_cents))},
+    }
@@ -1,13 +1,32 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, make_response
-from app import db, bcrypt
-from app.models import Member, MembershipPlan, Trainer, WorkoutPlan, Payment, Attendance, User, Inquiry, Goal
-from app.forms import MemberForm, MembershipPlanForm, PaymentForm, AttendanceForm, TrainerForm, WorkoutPlanForm, LoginForm, AdminRegistrationForm, MemberAndUserForm, InquiryForm, GoalForm, AdminGoalForm
-from datetime import datetime, timedelta
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, make_response, current_app, jsonify, Response, stream_with_context
+from app import db, bcrypt, metrics, choices, importer, exporter, checkins, memberships, revenue, attendance_analytics, utilization, goal_charts, goal_progress, goal_lifecycle, workout_goals
+from app.attendance_buffer import get_buffer, flush_pending
+from app.passwords import PasswordCheckBusy, verify_login
+from app.money import from_minor
+from app.models import Member, MembershipPlan, Trainer, WorkoutPlan, Payment, Attendance, User, Inquiry, Goal, MEMBERSHIP_STATUSES, GOAL_STATUSES
+from app.forms import MemberForm, MembershipPlanForm, PaymentForm, AttendanceForm, TrainerForm, WorkoutPlanForm, LoginForm, AdminRegistrationForm, MemberAndUserForm, InquiryForm, GoalForm, AdminGoalForm, ImportForm
+from app.database import fits_integer
+from app.pagination import paginate_from_request
+from app.search import search, lookup_label
+from datetime import date, datetime, timedelta
 from flask_login import login_user, current_user, logout_user, login_required
+import hmac
+import io
 import json
 
 bp = Blueprint('main', __name__)
 
+def _date_arg(name):
+    # Malformed dates are ignored rather than rejected, like other list filters
+    return request.args.get(name, type=date.fromisoformat)
+
+def _id_arg(name):
+    # Malformed ids are ignored too, but one too large to bind is a bad request
+    value = request.args.get(name, type=int)
+    if value is not None and not fits_integer(value):
+        abort(400)
+    return value
+
 @bp.route('/')
 @bp.route('/home')
 def home():
@@ -25,7 +44,9 @@ def inquiry():
             message=form.message.data
         )
         db.session.add(inquiry)
+        metrics.increment('total_inquiries')
         db.session.commit()
+        _invalidate_dashboard()
         flash('Your inquiry has been submitted successfully!', 'success')
         return redirect(url_for('main.home'))
     return render_template('inquiry.html', title='Submit Inquiry', form=form)
@@ -65,7 +86,12 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(form.password.data):
+        try:
+            password_ok = user is not None and verify_login(user, form.password.data)
+        except PasswordCheckBusy:
+            flash('We are signing in a lot of people right now. Please try again in a moment.', 'warning')
+            return render_template('auth/login.html', title='Login', form=form), 503
+        if password_ok:
             login_user(user, remember=form.remember_me.data)
             next_page = request.args.get('next')
             if user.role == 'admin':
@@ -91,35 +117,55 @@ def dashboard():
         flash('Access denied. Admins only.', 'danger')
         abort(403)
 
-    total_members = Member.query.count()
-    active_members = Member.query.filter(Member.membership_end_date >= datetime.utcnow().date()).count()
-    
     today = datetime.utcnow().date()
-    today_checkins = Attendance.query.filter(
-        db.func.date(Attendance.check_in_time) == today
-    ).count()
-
-    total_revenue = db.session.query(db.func.sum(Payment.amount)).scalar() or 0
-    inquiries_count = Inquiry.query.count()
-
-    expiring_members = Member.query.filter(
-        Member.membership_end_date >= today,
-        Member.membership_end_date <= today + timedelta(days=7)
+    # Keyed by day so the cached counts roll over at midnight
+    stats = current_app.extensions['dashboard_cache'].get_or_set(today, lambda: _dashboard_stats(today))
+    return render_template('admin_dashboard.html', title='Admin Dashboard', **stats)
+
+def _dashboard_stats(today):
+    flush_pending()
+    memberships.sweep_if_due(today)
+    today_start = datetime.combine(today, datetime.min.time())
+    expiring_filter = Member.membership_status == 'expiring'
+    renewal_filter = Member.membership_status == 'expired'
+
+    metrics.refresh_active_members(today)
+    counters = metrics.read()
+    if not all(name in counters for name in metrics.COUNTERS):
+        counters = metrics.rebuild(today)
+
+    def count(model, *criteria):
+        return db.select(db.func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+    # The remaining date-dependent counts in a single round trip
+    counts = db.session.execute(db.select(
+        count(Attendance, Attendance.check_in_time >= today_start,
+              Attendance.check_in_time < today_start + timedelta(days=1)).label('today_checkins'),
+        count(Member, expiring_filter).label('expiring_count'),
+        count(Member, renewal_filter).label('renewal_count'),
+    )).one()
+
+    limit = current_app.config['DASHBOARD_ALERT_LIMIT']
+    member_columns = (Member.id, Member.name, Member.membership_end_date)
+    expiring_members = db.session.execute(
+        db.select(*member_columns).where(expiring_filter)
+        .order_by(Member.membership_end_date, Member.id).limit(limit)
     ).all()
-
-    members_needing_renewal = Member.query.filter(
-        Member.membership_end_date < today,
-        Member.membership_end_date != None
+    members_needing_renewal = db.session.execute(
+        db.select(*member_columns).where(renewal_filter)
+        .order_by(Member.membership_end_date.desc(), Member.id.desc()).limit(limit)
     ).all()
 
-    return render_template('admin_dashboard.html', title='Admin Dashboard', 
-                           total_members=total_members,
-                           active_members=active_members,
-                           today_checkins=today_checkins,
-                           total_revenue=total_revenue,
-                           inquiries_count=inquiries_count,
-                           expiring_members=expiring_members,
-                           members_needing_renewal=members_needing_renewal)
+    return dict(counts._asdict(),
+                total_members=counters['total_members'],
+                active_members=counters['active_members'],
+                total_revenue=from_minor(counters['total_revenue_cents']),
+                inquiries_count=counters['total_inquiries'],
+                expiring_members=expiring_members,
+                members_needing_renewal=members_needing_renewal)
+
+def _invalidate_dashboard():
+    current_app.extensions['dashboard_cache'].clear()
 
 @bp.route('/admin/inquiries')
 @login_required
@@ -142,6 +188,7 @@ def create_member_and_user():
             name=form.name.data,
             email=form.email.data,
             phone=form.phone.data,
+            card_code=form.card_code.data or None,
             join_date=form.membership_start_date.data,
             membership_start_date=form.membership_start_date.data,
             membership_end_date=form.membership_end_date.data,
@@ -150,6 +197,8 @@ def create_member_and_user():
             workout_plan_id=form.workout_plan.data if form.workout_plan.data != 0 else None
         )
         db.session.add(member)
+        metrics.increment('total_members')
+        metrics.track_membership_change(None, member.membership_end_date)
         db.session.commit()
 
         user = User(
@@ -161,13 +210,49 @@ def create_member_and_user():
         user.member_id = member.id
         db.session.add(user)
         db.session.commit()
+        _invalidate_dashboard()
 
         flash('Member and user account created successfully!', 'success')
         return redirect(url_for('main.list_members'))
     return render_template('admin/create_member_and_user.html', title='Create Member and User', form=form)
 
+# --- Typeahead Search API (Admin) ---
+
+def _search_response(model, column, label_attr):
+    if current_user.role != 'admin':
+        abort(403)
+    limit = request.args.get('limit', current_app.config['SEARCH_RESULTS_LIMIT'], type=int)
+    limit = max(1, min(limit, current_app.config['MAX_SEARCH_RESULTS']))
+    results = search(model, column, request.args.get('q'), limit)
+    return jsonify(results=[{'id': obj.id, 'name': getattr(obj, label_attr), 'label': lookup_label(obj, label_attr)}
+                            for obj in results])
+
+@bp.route('/api/members/search')
+@login_required
+def search_members():
+    return _search_response(Member, Member.name, 'name')
+
+@bp.route('/api/users/search')
+@login_required
+def search_users():
+    return _search_response(User, User.username, 'username')
+
 # --- Member Management Routes ---
 
+@bp.route('/admin/runtime-stats')
+@login_required
+def runtime_stats():
+    if current_user.role != 'admin':
+        flash('Access denied. Admins only.', 'danger')
+        abort(403)
+    # Counters are per worker process
+    return jsonify(
+        user_cache=current_app.extensions['user_cache'].stats(),
+        dashboard_cache=current_app.extensions['dashboard_cache'].stats(),
+        analytics_cache=current_app.extensions['analytics_cache'].stats(),
+        password_checks=current_app.extensions['password_checker'].stats(),
+    )
+
 @bp.route('/members')
 @login_required
 def list_members():
@@ -175,8 +260,19 @@ def list_members():
         flash('Access denied. Admins and Subscription users only.', 'danger')
         abort(403)
     
-    members = Member.query.all()
-    return render_template('members/list.html', title='Members', members=members)
+    memberships.sweep_if_due(datetime.utcnow().date())
+    status = request.args.get('status')
+    query = Member.query
+    if status in MEMBERSHIP_STATUSES:
+        # One status at a time: ix_member_membership_status_name then serves the sort too
+        query = query.filter(Member.membership_status == status)
+    else:
+        status = None
+
+    page = paginate_from_request(query, [Member.name, Member.id])
+    filters = {'status': status, 'per_page': request.args.get('per_page')}
+    return render_template('members/list.html', title='Members', members=page.items,
+                           page=page, filters=filters)
 
 @bp.route('/members/add', methods=['GET', 'POST'])
 @login_required
@@ -190,6 +286,7 @@ def add_member():
             name=form.name.data,
             email=form.email.data,
             phone=form.phone.data,
+            card_code=form.card_code.data or None,
             join_date=form.membership_start_date.data,
             membership_start_date=form.membership_start_date.data,
             membership_end_date=form.membership_end_date.data,
@@ -198,7 +295,10 @@ def add_member():
             workout_plan_id=form.workout_plan.data if form.workout_plan.data != 0 else None
         )
         db.session.add(member)
+        metrics.increment('total_members')
+        metrics.track_membership_change(None, member.membership_end_date)
         db.session.commit()
+        _invalidate_dashboard()
         flash('Member added successfully!', 'success')
         return redirect(url_for('main.list_members'))
     return render_template('members/form.html', title='Add Member', form=form)
@@ -216,6 +316,8 @@ def view_member(member_id):
         flash('Access denied. You can only view your own profile.', 'danger')
         abort(403)
 
+    flush_pending()
+    memberships.sweep_if_due(datetime.utcnow().date())
     return render_template('members/profile.html', title=f'Member: {member.name}', member=member)
 
 @bp.route('/members/edit/<int:member_id>', methods=['GET', 'POST'])
@@ -227,16 +329,20 @@ def edit_member(member_id):
     member = Member.query.get_or_404(member_id)
     form = MemberForm(obj=member)
     if form.validate_on_submit():
+        old_end_date = member.membership_end_date
         member.name = form.name.data
         member.email = form.email.data
         member.phone = form.phone.data
+        member.card_code = form.card_code.data or None
         member.membership_start_date = form.membership_start_date.data
         member.membership_end_date = form.membership_end_date.data
         member.membership_plan_id = form.membership_plan.data if form.membership_plan.data != 0 else None
         member.trainer_id = form.trainer.data if form.trainer.data != 0 else None
         member.workout_plan_id = form.workout_plan.data if form.workout_plan.data != 0 else None
+        metrics.track_membership_change(old_end_date, member.membership_end_date)
         
         db.session.commit()
+        _invalidate_dashboard()
         flash('Member updated successfully!', 'success')
         return redirect(url_for('main.view_member', member_id=member.id))
     return render_template('members/form.html', title=f'Edit Member: {member.name}', form=form, member=member)
@@ -288,12 +394,19 @@ def delete_member(member_id):
         abort(403)
     member = Member.query.get_or_404(member_id)
     db.session.delete(member)
+    metrics.increment('total_members', -1)
+    metrics.track_membership_change(member.membership_end_date, None)
     db.session.commit()
+    _invalidate_dashboard()
     flash('Member deleted successfully!', 'success')
     return redirect(url_for('main.list_members'))
 
 # --- Membership Plan Management Routes ---
 
+def _has_members(column, key):
+    # An indexed EXISTS stops at the first member rather than counting them all
+    return db.session.scalar(db.select(db.select(Member.id).where(column == key).exists()))
+
 @bp.route('/plans')
 @login_required
 def list_plans():
@@ -301,7 +414,8 @@ def list_plans():
         flash('Access denied. Admins and Subscription users only.', 'danger')
         abort(403)
     plans = MembershipPlan.query.all()
-    return render_template('plans/list.html', title='Membership Plans', plans=plans)
+    usage = utilization.by_id('plans') if current_user.role == 'admin' else None
+    return render_template('plans/list.html', title='Membership Plans', plans=plans, usage=usage)
 
 @bp.route('/plans/add', methods=['GET', 'POST'])
 @login_required
@@ -318,6 +432,7 @@ def add_plan():
         )
         db.session.add(plan)
         db.session.commit()
+        choices.invalidate()
         flash('Membership plan added successfully!', 'success')
         return redirect(url_for('main.list_plans'))
     return render_template('plans/form.html', title='Add Membership Plan', form=form)
@@ -335,6 +450,7 @@ def edit_plan(plan_id):
         plan.duration_days = form.duration_days.data
         plan.price = form.price.data
         db.session.commit()
+        choices.invalidate()
         flash('Membership plan updated successfully!', 'success')
         return redirect(url_for('main.list_plans'))
     return render_template('plans/form.html', title=f'Edit Membership Plan: {plan.name}', form=form)
@@ -346,11 +462,12 @@ def delete_plan(plan_id):
         flash('Access denied. Admins only.', 'danger')
         abort(403)
     plan = MembershipPlan.query.get_or_404(plan_id)
-    if plan.members.count() > 0:
+    if _has_members(Member.membership_plan_id, plan.id):
         flash('Cannot delete plan: Members are currently assigned to it.', 'danger')
     else:
         db.session.delete(plan)
         db.session.commit()
+        choices.invalidate()
         flash('Membership plan deleted successfully!', 'success')
     return redirect(url_for('main.list_plans'))
 
@@ -363,16 +480,30 @@ def list_payments():
         flash('Access denied. Admins and Subscription users only.', 'danger')
         abort(403)
     
+    member_id = _id_arg('member_id')
+    start, end = _date_arg('start'), _date_arg('end')
+
+    query = Payment.query.options(db.joinedload(Payment.member), db.joinedload(Payment.plan))
     if current_user.role == 'subscription':
         member = Member.query.filter_by(email=current_user.email).first()
-        if member:
-            payments = Payment.query.filter_by(member_id=member.id).order_by(Payment.payment_date.desc()).all()
-        else:
-            payments = []
-    else: # Admin
-        payments = Payment.query.order_by(Payment.payment_date.desc()).all()
-    
-    return render_template('payments/list.html', title='Payments', payments=payments)
+        member_id = None
+        query = query.filter(Payment.member_id == (member.id if member else None))
+    elif member_id:
+        query = query.filter(Payment.member_id == member_id)
+    if start:
+        query = query.filter(Payment.payment_date >= start)
+    if end:
+        query = query.filter(Payment.payment_date <= end)
+
+    page = paginate_from_request(query, [Payment.payment_date, Payment.id], descending=True)
+    filters = {
+        'member_id': member_id,
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+        'per_page': request.args.get('per_page'),
+    }
+    return render_template('payments/list.html', title='Payments', payments=page.items,
+                           page=page, filters=filters)
 
 @bp.route('/payments/add', methods=['GET', 'POST'])
 @login_required
@@ -394,24 +525,152 @@ def add_payment():
             plan_id=form.membership_plan.data if form.membership_plan.data != 0 else None
         )
         db.session.add(payment)
+        metrics.increment('total_revenue_cents', payment.amount_cents)
+        revenue.record([(payment.payment_date, payment.plan_id, member.trainer_id, payment.amount_cents)])
+        old_end_date = member.membership_end_date
         
         if payment.plan_id:
             membership_plan = MembershipPlan.query.get(payment.plan_id)
             if membership_plan:
-                if not member.membership_start_date:
-                    member.membership_start_date = payment.payment_date
-                    member.membership_end_date = payment.payment_date + timedelta(days=membership_plan.duration_days)
-                elif member.membership_end_date and member.membership_end_date >= payment.payment_date:
-                    member.membership_end_date += timedelta(days=membership_plan.duration_days)
-                else:
-                    member.membership_start_date = payment.payment_date
-                    member.membership_end_date = payment.payment_date + timedelta(days=membership_plan.duration_days)
+                member.apply_plan_payment(membership_plan, payment.payment_date)
+        metrics.track_membership_change(old_end_date, member.membership_end_date)
         
         db.session.commit()
+        _invalidate_dashboard()
         flash('Payment recorded successfully!', 'success')
         return redirect(url_for('main.list_payments'))
     return render_template('payments/form.html', title='Record Payment', form=form)
 
+# --- Bulk Import ---
+
+@bp.route('/admin/import', methods=['GET', 'POST'])
+@login_required
+def bulk_import():
+    if current_user.role != 'admin':
+        flash('Access denied. Admins only.', 'danger')
+        abort(403)
+    form = ImportForm()
+    report = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace', newline='')
+        report = importer.import_stream(form.kind.data, stream, importer.detect_format(upload.filename))
+        _invalidate_dashboard()
+        flash(f'Imported {report.inserted} rows, {report.failed} rejected.',
+              'success' if not report.failed else 'warning')
+    return render_template('admin/import.html', title='Bulk Import', form=form, report=report)
+
+# --- Streaming Export ---
+
+def _export_response(name, statement):
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exporter.FORMATS:
+        abort(400)
+    start, end = request.args.get('start'), request.args.get('end')
+    period = f"_{start or 'start'}_to_{end or 'today'}" if start or end else ''
+    return Response(
+        stream_with_context(exporter.generate(statement, fmt)),
+        mimetype=exporter.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={name}{period}.{fmt}'},
+    )
+
+@bp.route('/payments/export')
+@login_required
+def export_payments():
+    if current_user.role != 'admin':
+        flash('Access denied. Admins only.', 'danger')
+        abort(403)
+    statement = exporter.payments(_date_arg('start'), _date_arg('end'), _id_arg('member_id'))
+    return _export_response('payments', statement)
+
+@bp.route('/attendance/export')
+@login_required
+def export_attendance():
+    if current_user.role != 'admin':
+        flash('Access denied. Admins only.', 'danger')
+        abort(403)
+    flush_pending()
+    statement = exporter.attendance(_date_arg('start'), _date_arg('end'), _id_arg('member_id'))
+    return _export_response('attendance', statement)
+
+@bp.route('/members/export')
+@login_required
+def export_members():
+    if current_user.role != 'admin':
+        flash('Access denied. Admins only.', 'danger')
+        abort(403)
+    memberships.sweep_if_due(datetime.utcnow().date())
+    statement = exporter.members(_date_arg('start'), _date_arg('end'), request.args.get('status'))
+    return _export_response('members', statement)
+
+# --- Revenue Reports ---
+
+def _month_arg(name):
+    # "2026-01" from <input type="month">; a full date picks its month
+    value = request.args.get(name, '')
+    try:
+        return date.fromisoformat(value + '-01' if len(value) == 7 else value)
+    except ValueError:
+        return None
+
+def _revenue_report():
+    period = request.args.get('period', 'month')
+    group = request.args.get('group', 'plan')
+    if period not in revenue.PERIODS or group not in revenue.GROUPS:
+        abort(400)
+    return revenue.report(_month_arg('start'), _month_arg('end'), period, group)
+
+@bp.route('/reports/revenue')
+@login_required
+def revenue_report():
+    if current_user.role != 'admin':
+        flash('Access denied. Admins only.', 'danger')
+        abort(403)
+    return render_template('reports/revenue.html', title='Revenue Report', report=_revenue_report(),
+                           periods=revenue.PERIODS, groups=revenue.GROUPS)
+
+@bp.route('/api/reports/revenue')
+@login_required
+def api_revenue_report():
+    if current_user.role != 'admin':
+        abort(403)
+    return jsonify(_revenue_report())
+
+def _attendance_report():
+    today = datetime.utcnow().date()
+    end = _date_arg('end') or today
+    start = _date_arg('start') or end - timedelta(days=current_app.config['ATTENDANCE_ANALYTICS_DEFAULT_DAYS'] - 1)
+    if start > end:
+        abort(400)
+    return attendance_analytics.analyze(start, end, today)
+
+@bp.route('/reports/attendance')
+@login_required
+def attendance_report():
+    if current_user.role != 'admin':
+        flash('Access denied. Admins only.', 'danger')
+        abort(403)
+    return render_template('reports/attendance.html', title='Attendance Analytics', report=_attendance_report())
+
+@bp.route('/api/reports/attendance')
+@login_required
+def api_attendance_report():
+    if current_user.role != 'admin':
+        abort(403)
+    return jsonify(_attendance_report())
+
+@bp.route('/api/reports/utilization')
+@login_required
+def api_utilization_report():
+    if current_user.role != 'admin':
+        abort(403)
+    kinds = [request.args['kind']] if 'kind' in request.args else utilization.KINDS
+    if any(kind not in utilization.KINDS for kind in kinds):
+        abort(400)
+    payload = {kind: utilization.report(kind) for kind in kinds}
+    payload['attendance_days'] = utilization.ATTENDANCE_DAYS
+    return jsonify(payload)
+
 # --- Attendance Tracking Routes ---
 
 @bp.route('/attendance')
@@ -421,16 +680,31 @@ def list_attendance():
         flash('Access denied. Admins and Subscription users only.', 'danger')
         abort(403)
     
+    member_id = _id_arg('member_id')
+    start, end = _date_arg('start'), _date_arg('end')
+
+    flush_pending()
+    query = Attendance.query.options(db.joinedload(Attendance.member))
     if current_user.role == 'subscription':
         member = Member.query.filter_by(email=current_user.email).first()
-        if member:
-            attendance_records = Attendance.query.filter_by(member_id=member.id).order_by(Attendance.check_in_time.desc()).all()
-        else:
-            attendance_records = []
-    else: # Admin
-        attendance_records = Attendance.query.order_by(Attendance.check_in_time.desc()).all()
-    
-    return render_template('attendance/list.html', title='Attendance Records', attendance_records=attendance_records)
+        member_id = None
+        query = query.filter(Attendance.member_id == (member.id if member else None))
+    elif member_id:
+        query = query.filter(Attendance.member_id == member_id)
+    if start:
+        query = query.filter(Attendance.check_in_time >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.filter(Attendance.check_in_time < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+
+    page = paginate_from_request(query, [Attendance.check_in_time, Attendance.id], descending=True)
+    filters = {
+        'member_id': member_id,
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+        'per_page': request.args.get('per_page'),
+    }
+    return render_template('attendance/list.html', title='Attendance Records',
+                           attendance_records=page.items, page=page, filters=filters)
 
 @bp.route('/attendance/checkin', methods=['GET', 'POST'])
 @login_required
@@ -448,26 +722,78 @@ def check_in():
         if not member.is_membership_active():
             flash(f'Member {member.name} does not have an active membership.', 'warning')
             
-        attendance = Attendance(
-            member_id=form.member.data,
-            check_in_time=form.check_in_time.data
-        )
-        db.session.add(attendance)
-        db.session.commit()
+        buffer = get_buffer()
+        if buffer is not None:
+            buffer.append(member.id, form.check_in_time.data)
+        else:
+            attendance = Attendance(
+                member_id=form.member.data,
+                check_in_time=form.check_in_time.data
+            )
+            db.session.add(attendance)
+            metrics.increment('total_checkins')
+            workout_goals.advance(db.session)
+            db.session.commit()
+            attendance_analytics.forget(attendance.check_in_time.date())
+        _invalidate_dashboard()
         flash(f'Member {member.name} checked in successfully!', 'success')
         return redirect(url_for('main.list_attendance'))
     return render_template('attendance/checkin_form.html', title='Member Check-in', form=form)
 
+# --- Kiosk Check-in API ---
+
+_CHECK_IN_STATUS_CODES = {
+    'checked_in': 201,
+    'duplicate': 200,
+    'invalid': 400,
+    'membership_inactive': 403,
+    'unknown_member': 404,
+}
+
+def _kiosk_authorized():
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    return any(hmac.compare_digest(token, allowed) for allowed in current_app.config['KIOSK_API_TOKENS'])
+
+@bp.route('/api/checkins', methods=['POST'])
+def api_check_in():
+    # Kiosks authenticate with a bearer token instead of a login session
+    if not _kiosk_authorized():
+        return jsonify(error='Missing or invalid kiosk token.'), 401
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error='Expected a JSON object.'), 400
+
+    if 'check_ins' in payload:
+        items = payload['check_ins']
+        if not isinstance(items, list) or not items:
+            return jsonify(error='check_ins must be a non-empty list.'), 400
+        if len(items) > current_app.config['KIOSK_MAX_BATCH']:
+            return jsonify(error=f"At most {current_app.config['KIOSK_MAX_BATCH']} check-ins per request."), 413
+        results = checkins.record(items)
+        response = jsonify(results=results), 200
+    else:
+        results = checkins.record([payload])
+        status_code = 202 if results[0].get('queued') else _CHECK_IN_STATUS_CODES[results[0]['status']]
+        response = jsonify(results[0]), status_code
+
+    if any(result['status'] == 'checked_in' for result in results):
+        _invalidate_dashboard()
+    return response
+
 @bp.route('/attendance/checkout/<int:attendance_id>', methods=['POST'])
 @login_required
 def check_out(attendance_id):
     if current_user.role != 'admin':
         flash('Access denied. Admins only.', 'danger')
         abort(403)
+    flush_pending()
     attendance = Attendance.query.get_or_404(attendance_id)
     if not attendance.check_out_time:
         attendance.check_out_time = datetime.utcnow()
         db.session.commit()
+        attendance_analytics.forget(attendance.check_in_time.date())
         flash(f'Member {attendance.member.name} checked out successfully!', 'success')
     else:
         flash('Member already checked out.', 'info')
@@ -483,8 +809,10 @@ def list_trainers():
         abort(403)
     
     trainers = Trainer.query.all()
+    usage = utilization.by_id('trainers') if current_user.role == 'admin' else None
     
-    return render_template('trainers/list.html', title='Trainers', trainers=trainers)
+    return render_template('trainers/list.html', title='Trainers', trainers=trainers, usage=usage,
+                           attendance_days=utilization.ATTENDANCE_DAYS)
 
 @bp.route('/trainers/add', methods=['GET', 'POST'])
 @login_required
@@ -501,6 +829,7 @@ def add_trainer():
         )
         db.session.add(trainer)
         db.session.commit()
+        choices.invalidate()
         flash('Trainer added successfully!', 'success')
         return redirect(url_for('main.list_trainers'))
     return render_template('trainers/form.html', title='Add Trainer', form=form)
@@ -518,6 +847,7 @@ def edit_trainer(trainer_id):
         trainer.specialization = form.specialization.data
         trainer.schedule = form.schedule.data
         db.session.commit()
+        choices.invalidate()
         flash('Trainer updated successfully!', 'success')
         return redirect(url_for('main.list_trainers'))
     return render_template('trainers/form.html', title=f'Edit Trainer: {trainer.name}', form=form)
@@ -529,11 +859,12 @@ def delete_trainer(trainer_id):
         flash('Access denied. Admins only.', 'danger')
         abort(403)
     trainer = Trainer.query.get_or_404(trainer_id)
-    if trainer.members.count() > 0:
+    if _has_members(Member.trainer_id, trainer.id):
         flash('Cannot delete trainer: Members are currently assigned to them.', 'danger')
     else:
         db.session.delete(trainer)
         db.session.commit()
+        choices.invalidate()
         flash('Trainer deleted successfully!', 'success')
     return redirect(url_for('main.list_trainers'))
 
@@ -547,8 +878,10 @@ def list_workout_plans():
         abort(403)
     
     workout_plans = WorkoutPlan.query.all()
+    usage = utilization.by_id('workout_plans') if current_user.role == 'admin' else None
     
-    return render_template('workout_plans/list.html', title='Workout Plans', workout_plans=workout_plans)
+    return render_template('workout_plans/list.html', title='Workout Plans', workout_plans=workout_plans,
+                           usage=usage)
 
 @bp.route('/workout_plans/add', methods=['GET', 'POST'])
 @login_required
@@ -565,6 +898,7 @@ def add_workout_plan():
         )
         db.session.add(workout_plan)
         db.session.commit()
+        choices.invalidate()
         flash('Workout plan added successfully!', 'success')
         return redirect(url_for('main.list_workout_plans'))
     return render_template('workout_plans/form.html', title='Add Workout Plan', form=form)
@@ -582,6 +916,7 @@ def edit_workout_plan(plan_id):
         workout_plan.description = form.description.data
         workout_plan.routines = form.routines.data
         db.session.commit()
+        choices.invalidate()
         flash('Workout plan updated successfully!', 'success')
         return redirect(url_for('main.list_workout_plans'))
     return render_template('workout_plans/form.html', title=f'Edit Workout Plan: {workout_plan.name}', form=form)
@@ -593,11 +928,12 @@ def delete_workout_plan(plan_id):
         flash('Access denied. Admins only.', 'danger')
         abort(403)
     workout_plan = WorkoutPlan.query.get_or_404(plan_id)
-    if workout_plan.members.count() > 0:
+    if _has_members(Member.workout_plan_id, workout_plan.id):
         flash('Cannot delete workout plan: Members are currently assigned to it.', 'danger')
     else:
         db.session.delete(workout_plan)
         db.session.commit()
+        choices.invalidate()
         flash('Workout plan deleted successfully!', 'success')
     return redirect(url_for('main.list_workout_plans'))
 
@@ -610,26 +946,24 @@ def list_goals():
         flash('Access denied. Admins and Subscription users only.', 'danger')
         abort(403)
     
+    goal_lifecycle.sweep_if_due(datetime.utcnow().date())
+    # Active goals unless asked otherwise: settled ones are history
+    status = request.args.get('status', 'active')
+    if status not in GOAL_STATUSES:
+        status = 'all'
+
+    query = Goal.query.options(db.joinedload(Goal.user))
     if current_user.role == 'subscription':
-        goals = Goal.query.filter_by(user_id=current_user.id).order_by(Goal.end_date.desc()).all()
-    else: # Admin
-        goals = Goal.query.order_by(Goal.end_date.desc()).all()
-
-    # Prepare data for category-based charting
-    chart_data_by_type = {}
-    goal_types = ['daily', 'weekly', 'monthly', 'yearly']
-
-    for goal_type in goal_types:
-        filtered_goals = [g for g in goals if g.goal_type == goal_type]
-        if filtered_goals:
-            chart_data_by_type[goal_type] = {
-                'labels': [goal.description for goal in filtered_goals],
-                'current_values': [goal.current_value for goal in filtered_goals],
-                'target_values': [goal.target_value for goal in filtered_goals]
-            }
-    
-    return render_template('goals/list.html', title='My Goals', goals=goals, 
-                           chart_data_by_type=chart_data_by_type)
+        query = query.filter(Goal.user_id == current_user.id)
+    if status != 'all':
+        query = query.filter(Goal.status == status)
+    page = paginate_from_request(query, [Goal.end_date, Goal.id], descending=True)
+    filters = {'status': status, 'per_page': request.args.get('per_page')}
+
+    # Charts are fetched from api_goal_chart once the page has loaded
+    return render_template('goals/list.html', title='My Goals', goals=page.items, page=page, filters=filters,
+                           chart_url=url_for('main.api_goal_chart', status=status),
+                           is_derived=workout_goals.is_derived)
 
 @bp.route('/goals/add', methods=['GET', 'POST'])
 @login_required
@@ -684,6 +1018,8 @@ def edit_goal(goal_id):
         goal.unit = form.unit.data
         goal.end_date = form.end_date.data
         goal.updated_at = datetime.utcnow()
+        # The target, window or unit may have changed
+        goal_lifecycle.refresh(goal)
         db.session.commit()
         flash('Goal updated successfully!', 'success')
         return redirect(url_for('main.list_goals'))
@@ -718,24 +1054,18 @@ def delete_goal(goal_id):
 def update_goal_progress(goal_id):
     goal = Goal.query.get_or_404(goal_id)
     
-    if current_user.role == 'subscription' and (goal.user_id != current_user.id or goal.is_admin_set):
+    # Shared with the progress sync API
+    if not goal_progress.can_update(current_user, goal.user_id, goal.is_admin_set):
         flash('Access denied. You can only update progress for your own non-admin-set goals.', 'danger')
         abort(403)
-    
-    if current_user.role == 'admin' and goal.is_admin_set:
-        pass # Admins can update progress for their own admin-set goals, or any user's goals
-    elif current_user.role == 'admin' and not goal.is_admin_set:
-        pass # Admins can update progress for user-set goals
-    elif current_user.role == 'subscription' and goal.user_id == current_user.id and not goal.is_admin_set:
-        pass # Users can update progress for their own non-admin-set goals
-    else:
-        flash('Access denied.', 'danger')
-        abort(403)
+    if workout_goals.is_derived(goal.unit):
+        flash('Progress of workouts goals is counted from check-ins.', 'warning')
+        return redirect(url_for('main.list_goals'))
 
     try:
         new_progress = float(request.form.get('progress'))
         goal.current_value = new_progress
-        goal.updated_at = datetime.utcnow()
+        goal.updated_at = goal.progress_at = datetime.utcnow()
         db.session.commit()
         flash('Goal progress updated successfully!', 'success')
     except ValueError:
@@ -743,6 +1073,25 @@ def update_goal_progress(goal_id):
     
     return redirect(url_for('main.list_goals'))
 
+# --- Goal Progress Sync API ---
+
+@bp.route('/api/goals/progress', methods=['POST'])
+@login_required
+def api_goal_progress():
+    if current_user.role not in ['admin', 'subscription']:
+        abort(403)
+    # get_json only reads application/json bodies, which another site cannot
+    # send with the user's cookie without passing a CORS preflight
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error='Expected a JSON object.'), 400
+    items = payload.get('updates')
+    if not isinstance(items, list) or not items:
+        return jsonify(error='updates must be a non-empty list.'), 400
+    if len(items) > current_app.config['GOAL_PROGRESS_MAX_BATCH']:
+        return jsonify(error=f"At most {current_app.config['GOAL_PROGRESS_MAX_BATCH']} updates per request."), 413
+    return jsonify(results=goal_progress.record(items, current_user))
+
 # --- Goal Management Routes (Admin) ---
 
 @bp.route('/admin/goals')
@@ -752,33 +1101,57 @@ def admin_list_goals():
         flash('Access denied. Admins only.', 'danger')
         abort(403)
     
-    all_users = User.query.order_by(User.username).all()
-    selected_user_id = request.args.get('user_id', type=int)
+    # The user filter is a typeahead, so only the selected user is loaded
+    selected_user_id = _id_arg('user_id')
+    selected_user = db.session.get(User, selected_user_id) if selected_user_id else None
 
-    goals_query = Goal.query.order_by(Goal.end_date.desc())
+    goal_lifecycle.sweep_if_due(datetime.utcnow().date())
+    status = request.args.get('status', 'active')
+    if status not in GOAL_STATUSES:
+        status = 'all'
 
+    query = Goal.query.options(db.joinedload(Goal.user))
     if selected_user_id:
-        goals_query = goals_query.filter_by(user_id=selected_user_id)
-    
-    goals = goals_query.all()
-
-    # Prepare data for category-based charting
-    chart_data_by_type = {}
-    goal_types = ['daily', 'weekly', 'monthly', 'yearly']
-
-    for goal_type in goal_types:
-        filtered_goals = [g for g in goals if g.goal_type == goal_type]
-        if filtered_goals:
-            chart_data_by_type[goal_type] = {
-                'labels': [f"{g.user.username}: {g.description}" for g in filtered_goals],
-                'current_values': [g.current_value for g in filtered_goals],
-                'target_values': [g.target_value for g in filtered_goals]
-            }
-
-    return render_template('goals/admin_list.html', title='All User Goals', goals=goals,
-                           chart_data_by_type=chart_data_by_type,
-                           all_users=all_users,
-                           selected_user_id=selected_user_id)
+        query = query.filter(Goal.user_id == selected_user_id)
+    if status != 'all':
+        query = query.filter(Goal.status == status)
+    page = paginate_from_request(query, [Goal.end_date, Goal.id], descending=True)
+    filters = {'user_id': selected_user_id, 'status': status, 'per_page': request.args.get('per_page')}
+
+    return render_template('goals/admin_list.html', title='All User Goals', goals=page.items, page=page,
+                           filters=filters,
+                           selected_user_label=lookup_label(selected_user, 'username') if selected_user else '',
+                           chart_url=url_for('main.api_goal_chart', user_id=selected_user_id, status=status),
+                           is_derived=workout_goals.is_derived)
+
+@bp.route('/api/goals/chart')
+@login_required
+def api_goal_chart():
+    if current_user.role not in ['admin', 'subscription']:
+        abort(403)
+    metric = request.args.get('metric', 'progress')
+    if metric not in goal_charts.METRICS:
+        abort(400)
+    limit = request.args.get('limit', current_app.config['GOAL_CHART_LIMIT'], type=int)
+    limit = max(1, min(limit, current_app.config['GOAL_CHART_MAX_LIMIT']))
+    if current_user.role == 'subscription':
+        user_id = current_user.id
+    else:
+        user_id = _id_arg('user_id')
+    # Every goal unless a status is given, as before the lists had one
+    status = request.args.get('status')
+    if status not in GOAL_STATUSES:
+        status = None
+
+    data = goal_charts.chart_data(user_id, metric, limit, with_usernames=current_user.role == 'admin',
+                                  status=status)
+    response = jsonify(data)
+    # Always revalidate, but a matching ETag gets an empty 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    response.add_etag()
+    return response.make_conditional(request)
 
 @bp.route('/admin/goals/add', methods=['GET', 'POST'])
 @login_required
@@ -824,6 +1197,8 @@ def admin_edit_goal(goal_id):
         goal.is_admin_set = form.is_admin_set.data
         goal.is_beginner_goal = form.is_beginner_goal.data
         goal.updated_at = datetime.utcnow()
+        # The owner, target, window or unit may have changed
+        goal_lifecycle.refresh(goal)
         db.session.commit()
         flash('Goal updated successfully!', 'success')
         return redirect(url_for('main.admin_list_goals'))
@@ -0,0 +1,72 @@
+"""Case-insensitive typeahead search over members and users.
+
+Prefix matches are answered from an index on ``lower(column)`` with a range
+predicate (``lower(name) >= 'ab' AND lower(name) < 'ac'``), which any
+database can serve from a B-tree. Substring matches cannot use that index,
+so they only run for longer queries and only to fill up a short result.
+
+The query is folded the way the database's ``lower()`` folds the column.
+SQLite only folds ASCII letters, so there "Åsa" is found by "Ås" or "ÅS"
+but not by "ås".
+"""
+import string
+
+from app import db
+from app.database import fits_integer
+
+MIN_SUBSTRING_LENGTH = 3
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def lookup_label(obj, attr):
+    return f'{getattr(obj, attr)} (#{obj.id})'
+
+
+def _prefix_range(expression, prefix):
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return db.and_(expression >= prefix, expression < upper)
+
+
+def _fold(text):
+    """Lower-case ``text`` as the database's ``lower()`` would."""
+    if db.engine.dialect.name == 'sqlite':
+        return text.translate(_ASCII_LOWER)
+    return text.lower()
+
+
+def _as_id(query):
+    """Return ``query`` as a primary key, or None when it cannot be one."""
+    # isdigit() alone also accepts digits such as '²' that int() rejects, and
+    # the length check keeps int() away from huge strings
+    if query.isascii() and query.isdigit() and len(query) <= 19 and fits_integer(int(query)):
+        return int(query)
+    return None
+
+
+def search(model, column, query, limit):
+    """Return up to ``limit`` rows of ``model`` whose ``column`` matches ``query``."""
+    query = _fold((query or '').strip())
+    if not query:
+        return []
+
+    lowered = db.func.lower(column)
+    results = []
+    exact_id = _as_id(query)
+    if exact_id is not None:
+        exact = db.session.get(model, exact_id)
+        if exact is not None:
+            results.append(exact)
+
+    prefix_filter = _prefix_range(lowered, query)
+    results += _matches(model, lowered, results, limit, prefix_filter)
+    if len(results) < limit and len(query) >= MIN_SUBSTRING_LENGTH:
+        results += _matches(model, lowered, results, limit,
+                            lowered.contains(query, autoescape=True), db.not_(prefix_filter))
+    return results
+
+
+def _matches(model, lowered, found, limit, *criteria):
+    if found:
+        criteria += (model.id.notin_([obj.id for obj in found]),)
+    return model.query.filter(*criteria).order_by(lowered, model.id).limit(limit - len(found)).all()
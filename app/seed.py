@@ -0,0 +1,297 @@
+"""Generate a large, realistic dataset for local performance work (``flask seed``).
+
+Everything comes from one ``random.Random(seed)`` and the given end date, so
+the same arguments always produce the same rows (only the bcrypt salt of the
+shared member password differs). Rows are written with core
+executemany inserts, ``batch_size`` rows per transaction, and ids are assigned
+here rather than returned by the database.
+
+The shape follows a real gym:
+
+* members join more often in recent years and pick mostly monthly plans;
+* each renewal is paid a few days before expiry, some members lapse and
+  come back later, and some leave for good;
+* visits only happen while a membership is active, more on weekdays, peaking
+  before work and after work, and a few regulars account for many of them;
+* users get goals across the four goal types, finished ones marked
+  completed or failed.
+"""
+import bisect
+import itertools
+from datetime import date, datetime, time, timedelta
+from random import Random
+
+from app import db, bcrypt, metrics, revenue, goal_lifecycle, workout_goals
+from app.models import (Member, MembershipPlan, Payment, Attendance, Trainer, WorkoutPlan, Inquiry, User, Goal,
+                        membership_after_payment, membership_status)
+from app.money import to_minor
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+               'Aarav', 'Priya', 'Sita', 'Ram', 'Anil', 'Sunita', 'Bikash', 'Asha', 'Hiro', 'Yuki', 'Chen', 'Mei',
+               'Omar', 'Fatima', 'Luca', 'Sofia', 'Mateo', 'Lucia', 'Noah', 'Emma']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee',
+              'Shrestha', 'Gurung', 'Tamang', 'Thapa', 'Sharma', 'Khan', 'Tanaka', 'Sato', 'Wang', 'Li', 'Rossi',
+              'Silva', 'Kim', 'Park', 'Nguyen', 'Ali', 'Novak', 'Müller', 'Dubois', 'Cohen']
+
+DEFAULT_PLANS = [('Monthly Basic', 30, 30.0), ('Quarterly', 90, 80.0), ('Yearly Premium', 365, 300.0)]
+PLAN_WEIGHTS = [0.6, 0.25, 0.15]
+# Chance that a member does not renew when a plan of this length runs out
+CHURN_BY_DURATION = {30: 0.06, 90: 0.12, 365: 0.25}
+# Of those who do not renew, the share who come back after a break
+COMEBACK_RATE = 0.35
+NO_PLAN_RATE = 0.05
+
+DEFAULT_TRAINERS = [('Strength Training', 'Mon-Fri 06:00-14:00'), ('Yoga', 'Mon-Sat 07:00-12:00'),
+                    ('HIIT', 'Mon-Fri 16:00-21:00'), ('Powerlifting', 'Tue-Sat 14:00-21:00'),
+                    ('Rehabilitation', 'Mon-Thu 09:00-17:00')]
+DEFAULT_WORKOUT_PLANS = [('Beginner Full Body', '3 sets of 10 reps: Squats, Bench Press, Rows'),
+                         ('Advanced Cardio', '30 min HIIT, 15 min steady state'),
+                         ('Push Pull Legs', 'Push, pull and leg days, 4 exercises each'),
+                         ('Upper Lower Split', 'Alternate upper and lower body, 5 sets of 5'),
+                         ('Mobility', '20 min stretching, 10 min foam rolling')]
+
+# Monday first. Weekends are quieter, Sunday most of all
+WEEKDAY_WEIGHTS = [1.0, 0.95, 0.95, 0.9, 0.8, 0.6, 0.4]
+# Check-ins by hour of day: a morning peak before work and a bigger one after
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0.2, 1.2, 1.6, 1.0, 0.6, 0.5, 0.5,
+                0.7, 0.6, 0.4, 0.5, 0.9, 1.7, 2.0, 1.6, 1.0, 0.5, 0.2, 0]
+_HOUR_CUMULATIVE = list(itertools.accumulate(HOUR_WEIGHTS))
+
+GOALS = [('workouts', 8, 60), ('minutes', 300, 3000), ('kg', 2, 15), ('calories', 5000, 60000)]
+GOAL_DAYS = {'daily': 1, 'weekly': 7, 'monthly': 30, 'yearly': 365}
+USER_RATE = 0.3
+
+
+class _Writer:
+    """Insert rows into a table through executemany, ``batch_size`` per transaction."""
+
+    def __init__(self, table, batch_size):
+        self.table = table
+        self.batch_size = batch_size
+        self.rows = []
+        self.count = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            with db.engine.begin() as connection:
+                connection.execute(self.table.insert(), self.rows)
+            self.count += len(self.rows)
+            self.rows = []
+
+
+def _next_id(model):
+    return (db.session.scalar(db.select(db.func.max(model.id))) or 0) + 1
+
+
+def _reference_data(rng):
+    """Return the plans, trainer ids and workout plan ids, creating defaults if there are none."""
+    if not db.session.scalar(db.select(db.func.count()).select_from(MembershipPlan)):
+        db.session.add_all(MembershipPlan(name=name, duration_days=days, price=price)
+                           for name, days, price in DEFAULT_PLANS)
+    if not db.session.scalar(db.select(db.func.count()).select_from(Trainer)):
+        db.session.add_all(Trainer(name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                                   specialization=specialization, schedule=schedule)
+                           for specialization, schedule in DEFAULT_TRAINERS)
+    if not db.session.scalar(db.select(db.func.count()).select_from(WorkoutPlan)):
+        db.session.add_all(WorkoutPlan(name=name, routines=routines) for name, routines in DEFAULT_WORKOUT_PLANS)
+    db.session.commit()
+    plans = db.session.execute(
+        db.select(MembershipPlan.id, MembershipPlan.duration_days, MembershipPlan.price)
+        .order_by(MembershipPlan.duration_days, MembershipPlan.id)).all()
+    return (plans, list(db.session.scalars(db.select(Trainer.id).order_by(Trainer.id))),
+            list(db.session.scalars(db.select(WorkoutPlan.id).order_by(WorkoutPlan.id))))
+
+
+def _poisson_round(rng, expected):
+    """Round ``expected`` up or down at random so the totals come out right."""
+    whole = int(expected)
+    return whole + (rng.random() < expected - whole)
+
+
+def _random_day(rng, first, last):
+    """A day in [first, last] (ordinals), weighted by day of week."""
+    while True:
+        day = rng.randint(first, last)
+        if rng.random() < WEEKDAY_WEIGHTS[(day - 1) % 7]:
+            return day
+
+
+def _random_time(rng):
+    hour = bisect.bisect_right(_HOUR_CUMULATIVE, rng.random() * _HOUR_CUMULATIVE[-1])
+    return time(min(hour, 23), rng.randrange(60), rng.randrange(60))
+
+
+def _months(first, last):
+    """Yield (first, last) day ordinals of each calendar month from ``first`` to ``last``."""
+    start = date.fromordinal(first).replace(day=1)
+    while start.toordinal() <= last:
+        following = (start + timedelta(days=32)).replace(day=1)
+        yield max(start.toordinal(), first), min(following.toordinal() - 1, last)
+        start = following
+
+
+def generate(members=20000, attendance=2000000, years=3, goals_per_user=3, inquiries=None,
+             seed=42, end_date=None, batch_size=50000, echo=print):
+    """Fill the database and return ``{table: rows inserted}``."""
+    rng = Random(seed)
+    # Stored membership statuses are as of the real today, as the app sees them
+    today = datetime.utcnow().date()
+    end_date = end_date or today
+    end = end_date.toordinal()
+    first = end - 365 * years
+    inquiries = members // 10 if inquiries is None else inquiries
+
+    plans, trainer_ids, workout_plan_ids = _reference_data(rng)
+    plan_weights = PLAN_WEIGHTS if len(plans) == len(PLAN_WEIGHTS) else None
+    member_id, payment_id, user_id = _next_id(Member), _next_id(Payment), _next_id(User)
+    attendance_id, goal_id, inquiry_id = _next_id(Attendance), _next_id(Goal), _next_id(Inquiry)
+
+    # --- Members and payments ---
+    member_writer = _Writer(Member.__table__, batch_size)
+    payment_writer = _Writer(Payment.__table__, batch_size)
+    user_writer = _Writer(User.__table__, batch_size)
+    # Per member: visit rate weight and the active (first, last) day ranges
+    activity = []
+    user_members = []
+    password_hash = bcrypt.generate_password_hash('password').decode('utf-8')
+    for index in range(members):
+        # Density grows linearly towards the end date: the gym keeps growing
+        joined = first + int((end - first) * rng.random() ** 0.5)
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        plan = None if rng.random() < NO_PLAN_RATE else rng.choices(plans, plan_weights)[0]
+
+        membership_start = membership_end = None
+        ranges = []
+        if plan is not None:
+            plan_id, duration, price = plan
+            churn = CHURN_BY_DURATION.get(duration, 0.1)
+            paid_on = date.fromordinal(joined)
+            while paid_on.toordinal() <= end:
+                payment_writer.add({'id': payment_id, 'member_id': member_id, 'amount_cents': to_minor(price),
+                                    'payment_date': paid_on, 'plan_id': plan_id})
+                payment_id += 1
+                membership_start, membership_end = membership_after_payment(
+                    membership_start, membership_end, paid_on, duration)
+                if ranges and ranges[-1][0] == membership_start.toordinal():
+                    ranges[-1] = (ranges[-1][0], membership_end.toordinal())
+                else:
+                    ranges.append((membership_start.toordinal(), membership_end.toordinal()))
+                if rng.random() >= churn:
+                    paid_on = membership_end - timedelta(days=rng.randint(0, 5))
+                elif rng.random() < COMEBACK_RATE:
+                    paid_on = membership_end + timedelta(days=rng.randint(14, 240))
+                else:
+                    break
+
+        member_writer.add({
+            'id': member_id, 'name': f'{first_name} {last_name}',
+            'email': f'{first_name}.{last_name}.{member_id}@example.com'.lower(),
+            'phone': f'98{rng.randrange(10 ** 8):08d}', 'card_code': f'GH{member_id:08d}' if rng.random() < 0.9 else None,
+            'join_date': date.fromordinal(joined), 'membership_plan_id': plan[0] if plan else None,
+            'membership_start_date': membership_start, 'membership_end_date': membership_end,
+            'membership_status': membership_status(membership_end, today),
+            'trainer_id': rng.choice(trainer_ids) if trainer_ids and rng.random() < 0.3 else None,
+            'workout_plan_id': rng.choice(workout_plan_ids) if workout_plan_ids and rng.random() < 0.4 else None,
+        })
+        # Most members come now and then; a few regulars come almost daily
+        activity.append((member_id, rng.gammavariate(1.5, 1.0), ranges))
+        if rng.random() < USER_RATE:
+            user_writer.add({'id': user_id, 'username': f'member{member_id}', 'password_hash': password_hash,
+                             'email': f'{first_name}.{last_name}.{member_id}@example.com'.lower(),
+                             'role': 'subscription', 'member_id': member_id})
+            user_members.append((user_id, ranges))
+            user_id += 1
+        member_id += 1
+    for writer in (member_writer, payment_writer, user_writer):
+        writer.flush()
+    echo(f'{member_writer.count} members, {payment_writer.count} payments, {user_writer.count} users')
+
+    # --- Attendance ---
+    # Scale the visit rates so the total lands on ``attendance``
+    member_days = sum(weight * sum(min(last, end) - start + 1 for start, last in ranges if start <= end)
+                      for _, weight, ranges in activity)
+    scale = attendance / member_days if member_days else 0
+    attendance_writer = _Writer(Attendance.__table__, batch_size)
+    for month_first, month_last in _months(first, end):
+        # One month at a time, sorted, so ids follow check-in time as in production
+        visits = []
+        for visitor, weight, ranges in activity:
+            for start, last in ranges:
+                overlap_first, overlap_last = max(start, month_first), min(last, month_last)
+                if overlap_first > overlap_last:
+                    continue
+                for _ in range(_poisson_round(rng, scale * weight * (overlap_last - overlap_first + 1))):
+                    check_in = datetime.combine(date.fromordinal(_random_day(rng, overlap_first, overlap_last)),
+                                                _random_time(rng))
+                    check_out = None
+                    if rng.random() < 0.92:
+                        check_out = check_in + timedelta(minutes=min(180, 30 + int(rng.expovariate(1 / 40))))
+                    visits.append((check_in, visitor, check_out))
+        # Check-out can be None: never compare it, even on a same-second tie
+        visits.sort(key=lambda visit: visit[:2])
+        for check_in, visitor, check_out in visits:
+            attendance_writer.add({'id': attendance_id, 'member_id': visitor,
+                                   'check_in_time': check_in, 'check_out_time': check_out})
+            attendance_id += 1
+        attendance_writer.flush()
+        echo(f'{date.fromordinal(month_first):%Y-%m}: {len(visits)} check-ins')
+
+    # --- Goals ---
+    goal_writer = _Writer(Goal.__table__, batch_size)
+    goal_types = list(GOAL_DAYS)
+    for owner, ranges in user_members:
+        for _ in range(rng.randint(0, 2 * goals_per_user)):
+            goal_type = rng.choice(goal_types)
+            unit, low, high = rng.choice(GOALS)
+            target = float(rng.randint(low, high))
+            span_first, span_last = (ranges[0][0], min(ranges[-1][1], end)) if ranges else (first, end)
+            starts = datetime.combine(date.fromordinal(rng.randint(span_first, max(span_first, span_last))),
+                                      time(rng.randrange(6, 22)))
+            ends = starts + timedelta(days=GOAL_DAYS[goal_type])
+            progress = min(1.0, rng.betavariate(2, 1.5) * 1.2)
+            if ends.date() < end_date:
+                status = 'completed' if progress >= 1 else 'failed'
+            else:
+                status = 'active'
+                progress *= (end - starts.toordinal()) / GOAL_DAYS[goal_type]
+            updated_at = min(ends, datetime.combine(end_date, time()))
+            goal_writer.add({
+                'id': goal_id, 'user_id': owner, 'goal_type': goal_type, 'unit': unit,
+                'description': f'{goal_type.capitalize()} target: {target:g} {unit}', 'target_value': target,
+                'current_value': round(target * max(0.0, min(progress, 1.0)), 1), 'start_date': starts,
+                'end_date': ends, 'is_admin_set': rng.random() < 0.2, 'is_beginner_goal': rng.random() < 0.1,
+                'status': status, 'created_at': starts, 'updated_at': updated_at, 'progress_at': updated_at,
+            })
+            goal_id += 1
+    goal_writer.flush()
+
+    # --- Inquiries ---
+    inquiry_writer = _Writer(Inquiry.__table__, batch_size)
+    for _ in range(inquiries):
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        inquiry_writer.add({
+            'id': inquiry_id, 'name': f'{first_name} {last_name}',
+            'email': f'{first_name}.{last_name}.{inquiry_id}@example.net'.lower(),
+            'phone': f'98{rng.randrange(10 ** 8):08d}' if rng.random() < 0.7 else None,
+            'message': rng.choice(['What are your opening hours?', 'Do you offer personal training?',
+                                   'Is there a student discount?', 'Can I try a class before joining?']),
+            'submitted_at': datetime.combine(date.fromordinal(_random_day(rng, first, end)), _random_time(rng)),
+        })
+        inquiry_id += 1
+    inquiry_writer.flush()
+
+    metrics.rebuild()
+    revenue.rebuild()
+    # Active workouts goals count the seeded check-ins, as they would live
+    # ones; those that reach their target are then completed
+    workout_goals.rebuild()
+    goal_lifecycle.sweep()
+    return {'members': member_writer.count, 'payments': payment_writer.count, 'users': user_writer.count,
+            'attendance': attendance_writer.count, 'goals': goal_writer.count, 'inquiries': inquiry_writer.count}
@@ -0,0 +1,80 @@
+"""Opt-in per-request SQL instrumentation (``SQL_INSTRUMENTATION``).
+
+Cursor events time every statement a request runs. Each response then gets a
+``Server-Timing`` header, so the browser's network panel shows how much of
+the request was spent in the database:
+
+    Server-Timing: db;dur=4.1;desc="7 queries", app;dur=11.8
+
+When one statement shape runs more than ``SQL_REPEAT_THRESHOLD`` times in a
+request, a warning with the statement is logged. That is nearly always a lazy
+load in a loop (an N+1). Each request's query count, DB time and the
+``SQL_SLOWEST_STATEMENTS`` slowest statements are logged at DEBUG level.
+"""
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from app import db
+
+# "IN (?, ?, ?)" has as many placeholders as values; count it as one shape
+_EXPANDED_IN = re.compile(r'\(\?(?:, \?)+\)')
+
+
+def _shape(statement):
+    return _EXPANDED_IN.sub('(?...)', ' '.join(statement.split()))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_statements' in g:
+        conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is not None and has_request_context() and 'sql_statements' in g:
+        g.sql_statements.append((statement, time.perf_counter() - started))
+
+
+def _start_request():
+    g.sql_statements = []
+    g.request_started = time.perf_counter()
+
+
+def _finish_request(app, response):
+    statements = g.pop('sql_statements', None)
+    if statements is None:
+        return response
+    elapsed = time.perf_counter() - g.pop('request_started')
+    db_time = sum(duration for _, duration in statements)
+    response.headers.add('Server-Timing', f'db;dur={db_time * 1000:.1f};desc="{len(statements)} queries", '
+                                          f'app;dur={elapsed * 1000:.1f}')
+
+    threshold = app.config['SQL_REPEAT_THRESHOLD']
+    for shape, count in Counter(_shape(statement) for statement, _ in statements).items():
+        if count > threshold:
+            app.logger.warning('%s %s ran the same statement %d times (possible N+1): %s',
+                               request.method, request.path, count, shape)
+
+    if app.logger.isEnabledFor(logging.DEBUG):
+        slowest = sorted(statements, key=lambda item: item[1], reverse=True)[:app.config['SQL_SLOWEST_STATEMENTS']]
+        app.logger.debug('%s %s: %d queries, %.1f ms in the database, %.1f ms total%s',
+                         request.method, request.path, len(statements), db_time * 1000, elapsed * 1000,
+                         ''.join(f'\n  {duration * 1000:7.1f} ms  {_shape(statement)}'
+                                 for statement, duration in slowest))
+    return response
+
+
+def init_app(app):
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(lambda response: _finish_request(app, response))
@@ -0,0 +1,65 @@
+/* Goal progress charts: fetches the chart data once the page is up and
+   draws one bar chart per goal type. Redraws when the ranking changes. */
+document.querySelectorAll('[data-goal-chart-url]').forEach(function (container) {
+    var charts = container.querySelector('.goal-charts');
+    var metric = container.querySelector('select[name="metric"]');
+
+    function draw(type, chart) {
+        var column = document.createElement('div');
+        column.className = 'col-12 mb-4';
+        column.innerHTML = '<div class="card"><div class="card-header"></div>' +
+            '<div class="card-body"><canvas></canvas></div></div>';
+        var shown = chart.shown < chart.total ? ' (top ' + chart.shown + ' of ' + chart.total + ')' : '';
+        // No progress to average, e.g. goals without a target, reads as a dash rather than "null%"
+        var average = chart.average_progress === null ? '—' : chart.average_progress + '%';
+        column.querySelector('.card-header').textContent =
+            type.charAt(0).toUpperCase() + type.slice(1) + ' Goals Progress' + shown +
+            ' — ' + chart.completed + ' completed, average ' + average;
+        charts.appendChild(column);
+        new Chart(column.querySelector('canvas').getContext('2d'), {
+            type: 'bar',
+            data: {
+                labels: chart.labels,
+                datasets: [{
+                    label: 'Current Value',
+                    data: chart.current_values,
+                    backgroundColor: 'rgba(75, 192, 192, 0.6)',
+                    borderColor: 'rgba(75, 192, 192, 1)',
+                    borderWidth: 1
+                },
+                {
+                    label: 'Target Value',
+                    data: chart.target_values,
+                    backgroundColor: 'rgba(153, 102, 255, 0.6)',
+                    borderColor: 'rgba(153, 102, 255, 1)',
+                    borderWidth: 1
+                }]
+            },
+            options: {
+                responsive: true,
+                scales: {
+                    y: {
+                        beginAtZero: true
+                    }
+                }
+            }
+        });
+    }
+
+    function load() {
+        var url = new URL(container.dataset.goalChartUrl, window.location.href);
+        url.searchParams.set('metric', metric.value);
+        // The browser revalidates with If-None-Match and reuses its copy on a 304
+        fetch(url, {credentials: 'same-origin'})
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                charts.innerHTML = '';
+                data.types.forEach(function (chart) {
+                    draw(chart.goal_type, chart);
+                });
+            });
+    }
+
+    metric.addEventListener('change', load);
+    load();
+});
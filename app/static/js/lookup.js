@@ -0,0 +1,36 @@
+/* Typeahead for LookupField inputs: fills the datalist from the search
+   endpoint and copies the chosen record's id into the hidden field. */
+document.querySelectorAll('input[data-lookup-url]').forEach(function (input) {
+    var hidden = document.getElementById(input.dataset.lookupTarget);
+    var list = document.getElementById(input.getAttribute('list'));
+    var ids = {};
+    var timer = null;
+
+    if (input.value && hidden.value) {
+        ids[input.value] = hidden.value;
+    }
+
+    input.addEventListener('input', function () {
+        hidden.value = ids[input.value] || '';
+        clearTimeout(timer);
+        var query = input.value.trim();
+        if (!query || hidden.value) {
+            return;
+        }
+        timer = setTimeout(function () {
+            fetch(input.dataset.lookupUrl + '?q=' + encodeURIComponent(query))
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    list.innerHTML = '';
+                    ids = {};
+                    data.results.forEach(function (item) {
+                        var option = document.createElement('option');
+                        option.value = item.label;
+                        list.appendChild(option);
+                        ids[item.label] = item.id;
+                    });
+                    hidden.value = ids[input.value] || '';
+                });
+        }, 200);
+    });
+});
@@ -0,0 +1,127 @@
+"""Cached user loader for Flask-Login.
+
+``load_user`` runs on every authenticated request, and routes only need the
+user's id, username, email, role and member id. Those are kept per process in
+a bounded TTL cache as a small ``CachedUser`` (detached from any session), so
+a page view no longer queries the ``user`` table just to authenticate.
+
+Committing a change to one of those fields, or deleting the user, drops the
+entry and bumps a version stamp file (``USER_CACHE_VERSION_FILE``), so the
+other workers on the host clear their copies on their next request. ``USER_CACHE_TTL`` bounds how stale
+an entry can get when a user row is edited outside the ORM.
+"""
+import os
+import threading
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.cache import TTLCache, VersionStamp
+from app.models import User
+
+
+class CachedUser(UserMixin):
+    """The fields of ``User`` that requests read, safe to share between requests."""
+
+    def __init__(self, id, username, email, role, member_id):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.role = role
+        self.member_id = member_id
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+class UserCache:
+
+    def __init__(self, version_file, ttl=300, maxsize=1024):
+        self.users = TTLCache(ttl=ttl, maxsize=maxsize)
+        self.stamp = VersionStamp(version_file)
+        self._version = self.stamp.read()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        version = self.stamp.read()
+        if version != self._version:
+            # Another process changed a user: we cannot tell which, so start over
+            with self._lock:
+                self.users.clear()
+                self._version = version
+        user = self.users.get(user_id)
+        if user is None:
+            row = db.session.execute(
+                db.select(User.id, User.username, User.email, User.role, User.member_id)
+                .where(User.id == user_id)
+            ).first()
+            if row is None:
+                return None
+            user = CachedUser(*row)
+            self.users.set(user_id, user)
+        return user
+
+    def invalidate(self, user_ids):
+        for user_id in user_ids:
+            self.users.delete(user_id)
+        self.stamp.bump()
+        self._version = self.stamp.read()
+
+    def stats(self):
+        return self.users.stats()
+
+
+def load_user(user_id):
+    return current_app.extensions['user_cache'].get(int(user_id))
+
+
+# --- Invalidation ---
+# Changed ids are collected while the session flushes and acted on after
+# commit, so a concurrent request cannot re-cache the old row in between.
+
+# The columns CachedUser copies; a login that rehashes the password changes
+# none of them, so it leaves every worker's cache alone
+CACHED_FIELDS = ('id', 'username', 'email', 'role', 'member_id')
+
+
+def _remember(target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(User, 'after_update')
+def _remember_updated_user(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in CACHED_FIELDS):
+        _remember(target)
+
+
+@event.listens_for(User, 'after_delete')
+def _remember_deleted_user(mapper, connection, target):
+    _remember(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    user_ids = session.info.pop('changed_user_ids', None)
+    if user_ids and has_app_context():
+        cache = current_app.extensions.get('user_cache')
+        if cache is not None:
+            cache.invalidate(user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
+
+
+def init_app(app):
+    app.extensions['user_cache'] = UserCache(
+        app.config.get('USER_CACHE_VERSION_FILE') or os.path.join(app.instance_path, 'users.version'),
+        ttl=app.config['USER_CACHE_TTL'],
+        maxsize=app.config['USER_CACHE_SIZE'],
+    )
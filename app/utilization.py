@@ -0,0 +1,76 @@
+"""Member counts per trainer, membership plan and workout plan.
+
+Each report is a fixed number of GROUP BY queries, however many trainers or
+plans there are: members and current (active or expiring) members grouped
+by the member's trainer, plan or workout plan, and for trainers also the
+check-ins of their members over the last ``ATTENDANCE_DAYS`` days. The list
+pages and ``/api/reports/utilization`` share the results through a
+per-process cache keyed by day, so counts may lag by up to
+``UTILIZATION_CACHE_TTL`` seconds.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db, choices, memberships
+from app.cache import TTLCache
+from app.models import Attendance, Member, CURRENT_STATUSES
+
+KINDS = ('trainers', 'plans', 'workout_plans')
+ATTENDANCE_DAYS = 30
+
+_member = Member.__table__
+_attendance = Attendance.__table__
+
+
+def _member_counts(column):
+    current = db.func.sum(db.case((_member.c.membership_status.in_(CURRENT_STATUSES), 1), else_=0))
+    rows = db.session.execute(
+        db.select(column, db.func.count(), current).where(column != None).group_by(column))
+    return {key: {'members': members, 'active_members': current} for key, members, current in rows}
+
+
+def _recent_checkins(today):
+    since = datetime.combine(today, datetime.min.time()) - timedelta(days=ATTENDANCE_DAYS - 1)
+    rows = db.session.execute(
+        db.select(_member.c.trainer_id, db.func.count(), db.func.count(db.distinct(_attendance.c.member_id)))
+        .join(_member, _attendance.c.member_id == _member.c.id)
+        .where(_attendance.c.check_in_time >= since, _member.c.trainer_id != None)
+        .group_by(_member.c.trainer_id))
+    return {trainer_id: {'checkins': checkins, 'visiting_members': visitors}
+            for trainer_id, checkins, visitors in rows}
+
+
+def _build(kind, today):
+    memberships.sweep_if_due(today)
+    if kind == 'trainers':
+        names, counts = choices.trainer_choices(), _member_counts(_member.c.trainer_id)
+        recent = _recent_checkins(today)
+    elif kind == 'plans':
+        names, counts, recent = choices.plan_choices(), _member_counts(_member.c.membership_plan_id), None
+    else:
+        names, counts, recent = choices.workout_plan_choices(), _member_counts(_member.c.workout_plan_id), None
+
+    rows = []
+    for key, name in names:
+        row = {'id': key, 'name': name, 'members': 0, 'active_members': 0}
+        row.update(counts.get(key, {}))
+        if recent is not None:
+            row.update(recent.get(key, {'checkins': 0, 'visiting_members': 0}))
+        rows.append(row)
+    return rows
+
+
+def report(kind, today=None):
+    """Return one row per trainer, plan or workout plan (``kind``), ordered by name."""
+    today = today or datetime.utcnow().date()
+    return current_app.extensions['utilization_cache'].get_or_set((kind, today), lambda: _build(kind, today))
+
+
+def by_id(kind, today=None):
+    """``report`` as ``{id: row}``, for the list pages."""
+    return {row['id']: row for row in report(kind, today)}
+
+
+def init_app(app):
+    app.extensions['utilization_cache'] = TTLCache(ttl=app.config['UTILIZATION_CACHE_TTL'], maxsize=len(KINDS) * 2)
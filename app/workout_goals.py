@@ -0,0 +1,195 @@
+"""Progress of ``workouts`` goals, derived from attendance.
+
+Every check-in counts as one workout towards each active goal of the
+member's user whose unit is ``workouts`` and whose start and end dates take
+in the check-in time, the whole of the end date included. Nothing is recounted as check-ins arrive: the id of
+the newest attendance row applied so far is kept in ``gym_metrics`` as a
+high-water mark, and ``advance`` adds the check-ins past it with one
+grouped query over that primary-key range, reading only the goals of the
+users who checked in, and one UPDATE per goal. The
+check-in form, the kiosk API, the write-behind buffer and the importer call
+it in the transaction that stores the check-ins; ``flask goals catch-up``
+does the same in bounded batches for rows written any other way.
+
+``recount`` sets goals to their full count of check-ins up to the mark. It
+backs ``flask goals rebuild`` (run once after upgrading, so goals kept by
+hand until now are derived too) and goal edits, which may move the window.
+``flask goals check`` lists the goals that disagree with it.
+
+Moving the mark is a conditional UPDATE of its row, taken before anything
+else is read, so two transactions never apply the same check-ins. This
+relies on attendance ids becoming visible in the order they were handed
+out, which holds on SQLite, where writes are serialized.
+"""
+from datetime import datetime
+
+from app import db
+from app.models import Attendance, Goal, GymMetric, User, goal_running_at
+
+WORKOUT_UNITS = ('workout', 'workouts')
+MARK = 'workout_goals_attendance_id'
+CATCH_UP_BATCH_SIZE = 50000
+REBUILD_BATCH_SIZE = 5000
+
+_attendance = Attendance.__table__
+_goal = Goal.__table__
+_user = User.__table__
+_metric = GymMetric.__table__
+
+
+def _derived():
+    """Goals whose progress comes from attendance."""
+    return db.and_(_goal.c.status == 'active', db.func.lower(_goal.c.unit).in_(WORKOUT_UNITS))
+
+
+def _in_window():
+    # The same end of day as the lifecycle sweep: check-ins count through the end date
+    return db.and_(_attendance.c.check_in_time >= _goal.c.start_date, goal_running_at(_attendance.c.check_in_time))
+
+
+# Built once, like the kiosk check-in statements: advance runs on every
+# check-in, and building these costs more than running them
+_POSITION = db.select(
+    db.select(_metric.c.value).where(_metric.c.name == MARK).scalar_subquery(),
+    db.select(db.func.max(_attendance.c.id)).scalar_subquery(),
+)
+_MOVE_MARK = (
+    _metric.update().where(_metric.c.name == MARK, _metric.c.value == db.bindparam('old'))
+    .values(value=db.bindparam('new'), updated_at=db.bindparam('now'))
+)
+_NEW = db.and_(_attendance.c.id > db.bindparam('start'), _attendance.c.id <= db.bindparam('end'))
+# Starts from the users who checked in, so only their goals are read;
+# joined the other way round, SQLite scans every goal
+_CHECKED_IN_USERS = (
+    db.select(_user.c.id).join(_attendance, _attendance.c.member_id == _user.c.member_id)
+    .where(_NEW).correlate(None)
+)
+_NEW_WORKOUTS = (
+    db.select(_goal.c.id, db.func.count())
+    .select_from(_goal.join(_user, _user.c.id == _goal.c.user_id)
+                 .join(_attendance, db.and_(_attendance.c.member_id == _user.c.member_id, _in_window())))
+    .where(_goal.c.user_id.in_(_CHECKED_IN_USERS), _NEW, _derived())
+    .group_by(_goal.c.id)
+)
+_INCREMENT = (
+    _goal.update().where(_goal.c.id == db.bindparam('goal_id'))
+    .values(current_value=db.func.coalesce(_goal.c.current_value, 0) + db.bindparam('workouts'),
+            updated_at=db.bindparam('now'), progress_at=db.bindparam('now'))
+)
+
+
+def _move_mark(connection, old, new, now):
+    """Move the mark from ``old`` to ``new``; False if another transaction moved it first.
+
+    Until the transaction ends, no other one can move it.
+    """
+    if old is None:
+        # First run on a database created without migrations
+        connection.execute(_metric.insert().values(name=MARK, value=new, computed_on=now.date(), updated_at=now))
+        return True
+    return connection.execute(_MOVE_MARK, {'old': old, 'new': new, 'now': now}).rowcount == 1
+
+
+def _hold_mark(connection, now):
+    """Lock the mark for the rest of the transaction and return it."""
+    while True:
+        mark, newest = connection.execute(_POSITION).one()
+        if mark is None:
+            mark = newest or 0
+            if _move_mark(connection, None, mark, now):
+                return mark
+        elif _move_mark(connection, mark, mark, now):
+            return mark
+
+
+def behind(connection=None):
+    """How many attendance ids past the mark have not been applied yet."""
+    mark, newest = (connection or db.session).execute(_POSITION).one()
+    return (newest or 0) - (mark or 0)
+
+
+def advance(connection, limit=None, now=None):
+    """Apply the check-ins stored since the mark to goals, in the caller's transaction.
+
+    Covers at most ``limit`` attendance ids. Returns the workouts added,
+    0 as well when another transaction applied the same check-ins first.
+    """
+    now = now or datetime.utcnow()
+    mark, newest = connection.execute(_POSITION).one()
+    start = mark or 0
+    end = (newest or 0) if limit is None else min(newest or 0, start + limit)
+    if end <= start or not _move_mark(connection, mark, end, now):
+        return 0
+
+    rows = connection.execute(_NEW_WORKOUTS, {'start': start, 'end': end}).all()
+    if rows:
+        connection.execute(_INCREMENT, [{'goal_id': goal_id, 'workouts': workouts, 'now': now}
+                                        for goal_id, workouts in rows])
+    return sum(workouts for _, workouts in rows)
+
+
+def catch_up(batch_size=CATCH_UP_BATCH_SIZE):
+    """Apply every check-in past the mark, ``batch_size`` ids per transaction; return the workouts added."""
+    added = 0
+    while behind() > 0:
+        added += advance(db.session, limit=batch_size)
+        db.session.commit()
+    return added
+
+
+def _workouts(upto):
+    """The check-ins counting towards the goal of the enclosing statement, up to attendance id ``upto``."""
+    return (
+        db.select(db.func.count())
+        .select_from(_attendance.join(_user, _user.c.member_id == _attendance.c.member_id))
+        .where(_user.c.id == _goal.c.user_id, _in_window(), _attendance.c.id <= upto)
+        .scalar_subquery()
+    )
+
+
+def recount(*criteria, now=None):
+    """Set the derived goals matching ``criteria`` to their full count, in the caller's transaction.
+
+    Returns how many goals changed.
+    """
+    now = now or datetime.utcnow()
+    workouts = _workouts(_hold_mark(db.session, now))
+    return db.session.execute(
+        _goal.update()
+        .where(_derived(), *criteria, db.func.coalesce(_goal.c.current_value, 0) != workouts)
+        .values(current_value=workouts, updated_at=now, progress_at=now)
+    ).rowcount
+
+
+def is_derived(unit):
+    """Whether goals in ``unit`` take their progress from attendance rather than from users."""
+    return bool(unit) and unit.lower() in WORKOUT_UNITS
+
+
+def refresh(goal):
+    """Recount one edited goal, in the caller's transaction, if its progress is derived."""
+    if is_derived(goal.unit):
+        recount(_goal.c.id == goal.id)
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Recount every derived goal in goal-id batches; return how many changed."""
+    changed = 0
+    last_id = 0
+    max_id = db.session.scalar(db.select(db.func.max(_goal.c.id))) or 0
+    while last_id < max_id:
+        changed += recount(_goal.c.id > last_id, _goal.c.id <= last_id + batch_size)
+        db.session.commit()
+        last_id += batch_size
+    return changed
+
+
+def drift(limit=100):
+    """Return ``[(goal id, stored, derived)]`` for up to ``limit`` derived goals that disagree with attendance."""
+    mark = db.session.execute(_POSITION).one()[0]
+    workouts = _workouts(mark or 0)
+    return db.session.execute(
+        db.select(_goal.c.id, _goal.c.current_value, workouts)
+        .where(_derived(), db.func.coalesce(_goal.c.current_value, 0) != workouts)
+        .order_by(_goal.c.id).limit(limit)
+    ).all()
@@ -8,3 +8,140 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # PRAGMAs run on every new SQLite connection (ignored for other databases)
+    SQLITE_PRAGMAS = {}
+
+    # bcrypt work factor for new hashes; older hashes are rehashed to it on
+    # login. Each step doubles the cost of a check (12 is about 0.3 s)
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+
+    # Password checks run on a per-process pool: how many at once, how many
+    # may wait, and how long (seconds) a login waits before getting a 503.
+    # A waiting login holds its request thread that long, so with sync
+    # (non-threaded) workers keep the timeout near one check's p99
+    PASSWORD_CHECK_WORKERS = int(os.environ.get('PASSWORD_CHECK_WORKERS', 2))
+    PASSWORD_CHECK_QUEUE = 16
+    PASSWORD_CHECK_TIMEOUT = 5.0
+
+    # Per-request SQL instrumentation: a Server-Timing header with each
+    # request's DB time, and a warning when one statement runs more than
+    # SQL_REPEAT_THRESHOLD times in a request (usually an N+1)
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+    SQL_REPEAT_THRESHOLD = 10
+    SQL_SLOWEST_STATEMENTS = 5
+
+    # Keyset pagination for the list pages
+    ITEMS_PER_PAGE = 50
+    MAX_ITEMS_PER_PAGE = 200
+
+
+    # Admin dashboard: seconds to cache the headline metrics, and how many
+    # members to list under each renewal alert
+    DASHBOARD_CACHE_TTL = 30
+    DASHBOARD_ALERT_LIMIT = 20
+
+    # Member/user typeahead search
+    SEARCH_RESULTS_LIMIT = 10
+    MAX_SEARCH_RESULTS = 50
+
+    # Plan/trainer/workout-plan select choices are cached per process; the
+    # version file (default: instance/choices.version) tells workers to reload
+    CHOICES_VERSION_FILE = os.environ.get('CHOICES_VERSION_FILE')
+    CHOICES_CACHE_MAX_AGE = 3600
+
+    # Bulk import: rows validated and inserted per transaction
+    IMPORT_BATCH_SIZE = 20000
+
+    # Streaming export: rows fetched from the database per chunk
+    EXPORT_CHUNK_SIZE = 1000
+
+    # Kiosk check-in API: comma-separated bearer tokens, the most check-ins
+    # accepted in one request, and how many seconds ahead of the server's
+    # clock a check_in_time may be
+    KIOSK_API_TOKENS = [token for token in os.environ.get('KIOSK_API_TOKENS', '').split(',') if token]
+    KIOSK_MAX_BATCH = 100
+    KIOSK_MAX_CLOCK_SKEW = 300
+
+    # Goal progress sync API: the most samples accepted in one request, and
+    # how many seconds ahead of the server's clock a sample's timestamp may be
+    GOAL_PROGRESS_MAX_BATCH = 5000
+    GOAL_PROGRESS_MAX_CLOCK_SKEW = 300
+
+    # Write-behind check-ins: queue them in memory and write them in batches.
+    # Each worker flushes its own queue, so other workers may not show a
+    # check-in until the flush interval has passed.
+    # Durability is 'memory', 'journal' (survives a worker crash) or 'fsync'
+    # (survives a power cut); the journal defaults to instance/attendance-journal
+    ATTENDANCE_BUFFER_ENABLED = os.environ.get('ATTENDANCE_BUFFER_ENABLED', '').lower() in ('1', 'true', 'yes')
+    ATTENDANCE_BUFFER_MAX_ROWS = 10000
+    ATTENDANCE_BUFFER_FLUSH_ROWS = 500
+    ATTENDANCE_BUFFER_FLUSH_INTERVAL = 1.0
+    ATTENDANCE_BUFFER_DURABILITY = os.environ.get('ATTENDANCE_BUFFER_DURABILITY', 'journal')
+    ATTENDANCE_JOURNAL_DIR = os.environ.get('ATTENDANCE_JOURNAL_DIR')
+
+    # Attendance analytics: each past day's summary is cached per process, and
+    # the version file (default: instance/analytics.version) tells workers a
+    # past day changed; rows are read in chunks. Visits without a check-out, or
+    # longer than the maximum (a forgotten check-out), count as the default
+    # length on the floor
+    ATTENDANCE_ANALYTICS_VERSION_FILE = os.environ.get('ATTENDANCE_ANALYTICS_VERSION_FILE')
+    ATTENDANCE_ANALYTICS_CACHE_TTL = 6 * 3600
+    ATTENDANCE_ANALYTICS_CACHE_DAYS = 800
+    ATTENDANCE_ANALYTICS_CHUNK_SIZE = 100000
+    ATTENDANCE_ANALYTICS_DEFAULT_DAYS = 90
+    ATTENDANCE_DEFAULT_VISIT_MINUTES = 60
+    ATTENDANCE_MAX_VISIT_MINUTES = 600
+
+    # Goal charts: goals shown per goal type by default, and at most
+    GOAL_CHART_LIMIT = 20
+    GOAL_CHART_MAX_LIMIT = 100
+
+    # Trainer/plan utilization counts are cached per process for this many seconds
+    UTILIZATION_CACHE_TTL = 60
+
+    # Logged-in users are cached per process; the version file (default:
+    # instance/users.version) tells workers a user was edited or deleted
+    USER_CACHE_TTL = 300
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_VERSION_FILE = os.environ.get('USER_CACHE_VERSION_FILE')
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+class ProductionConfig(Config):
+    """Settings for several gunicorn workers sharing one database.
+
+    WAL lets readers carry on while a worker writes, and synchronous=NORMAL
+    only fsyncs at checkpoints (a power cut can lose the last transactions,
+    never corrupt the file). busy_timeout makes a blocked writer wait for the
+    lock instead of failing with "database is locked".
+    """
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        # Negative: KiB rather than pages, i.e. 64 MB per connection
+        'cache_size': -_env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024),
+        'temp_store': 'MEMORY',
+    }
+
+    # Connections per worker process. For PostgreSQL/MySQL keep
+    # workers * (pool size + overflow) under the server's connection limit
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        # Servers drop idle connections; replace them before they go stale
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': not Config.SQLALCHEMY_DATABASE_URI.startswith('sqlite'),
+    }
+
+
+# Selected with FLASK_CONFIG when create_app() is called without a config
+configs = {
+    'development': Config,
+    'production': ProductionConfig,
+}
@@ -28,7 +28,7 @@ def upgrade():
 def downgrade():
     # ### commands auto generated by Alembic - please adjust! ###
     with op.batch_alter_table('user', schema=None) as batch_op:
-        batch_op.drop_constraint(None, type_='foreignkey')
+        batch_op.drop_constraint('fk_user_member_id', type_='foreignkey')
         batch_op.drop_column('member_id')
 
     # ### end Alembic commands ###
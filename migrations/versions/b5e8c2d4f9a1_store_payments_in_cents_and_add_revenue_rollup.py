@@ -0,0 +1,84 @@
+"""store payments in cents and add revenue rollup
+
+Revision ID: b5e8c2d4f9a1
+Revises: a7d3e5f1c8b2
+Create Date: 2026-10-18 18:47:09.631520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e8c2d4f9a1'
+down_revision = 'a7d3e5f1c8b2'
+branch_labels = None
+depends_on = None
+
+
+def _month_start(column):
+    if op.get_bind().dialect.name == 'sqlite':
+        return sa.func.date(column, 'start of month')
+    return sa.cast(sa.func.date_trunc('month', column), sa.Date)
+
+
+def upgrade():
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount_cents', sa.Integer(), nullable=True))
+
+    payment = sa.table('payment', sa.column('amount', sa.Float), sa.column('amount_cents', sa.Integer),
+                       sa.column('payment_date', sa.Date), sa.column('plan_id', sa.Integer),
+                       sa.column('member_id', sa.Integer))
+    op.execute(payment.update().values(amount_cents=sa.cast(sa.func.round(payment.c.amount * 100), sa.Integer)))
+
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.alter_column('amount_cents', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('amount')
+
+    op.create_table('revenue_month',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('plan_id', sa.Integer(), nullable=True),
+    sa.Column('trainer_id', sa.Integer(), nullable=True),
+    sa.Column('payment_count', sa.Integer(), nullable=False),
+    sa.Column('amount_cents', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_revenue_month_key', 'revenue_month',
+                    ['month', sa.text('coalesce(plan_id, 0)'), sa.text('coalesce(trainer_id, 0)')], unique=True)
+
+    # Backfill the rollup, attributing payments to each member's current trainer
+    member = sa.table('member', sa.column('id', sa.Integer), sa.column('trainer_id', sa.Integer))
+    rollup = sa.table('revenue_month', sa.column('month', sa.Date), sa.column('plan_id', sa.Integer),
+                      sa.column('trainer_id', sa.Integer), sa.column('payment_count', sa.Integer),
+                      sa.column('amount_cents', sa.Integer))
+    month = _month_start(payment.c.payment_date)
+    op.execute(rollup.insert().from_select(
+        ['month', 'plan_id', 'trainer_id', 'payment_count', 'amount_cents'],
+        sa.select(month, payment.c.plan_id, member.c.trainer_id, sa.func.count(), sa.func.sum(payment.c.amount_cents))
+        .select_from(payment.join(member, payment.c.member_id == member.c.id))
+        .group_by(month, payment.c.plan_id, member.c.trainer_id)))
+
+    # The revenue counter is kept in cents from now on
+    metrics = sa.table('gym_metrics', sa.column('name', sa.String), sa.column('value', sa.Float))
+    op.execute(metrics.update().where(metrics.c.name == 'total_revenue')
+               .values(name='total_revenue_cents', value=sa.func.round(metrics.c.value * 100)))
+
+
+def downgrade():
+    metrics = sa.table('gym_metrics', sa.column('name', sa.String), sa.column('value', sa.Float))
+    op.execute(metrics.update().where(metrics.c.name == 'total_revenue_cents')
+               .values(name='total_revenue', value=metrics.c.value / 100.0))
+
+    op.drop_index('ix_revenue_month_key', table_name='revenue_month')
+    op.drop_table('revenue_month')
+
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('amount', sa.Float(), nullable=True))
+
+    payment = sa.table('payment', sa.column('amount', sa.Float), sa.column('amount_cents', sa.Integer))
+    op.execute(payment.update().values(amount=payment.c.amount_cents / 100.0))
+
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.alter_column('amount', existing_type=sa.Float(), nullable=False)
+        batch_op.drop_column('amount_cents')
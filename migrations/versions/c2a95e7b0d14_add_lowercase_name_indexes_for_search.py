@@ -0,0 +1,26 @@
+"""add lowercase name indexes for search
+
+Revision ID: c2a95e7b0d14
+Revises: 8d3f6a1e27c5
+Create Date: 2026-10-18 12:05:36.913402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2a95e7b0d14'
+down_revision = '8d3f6a1e27c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_member_name_lower', 'member', [sa.text('lower(name)')], unique=False)
+    op.create_index('ix_user_username_lower', 'user', [sa.text('lower(username)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_username_lower', table_name='user')
+    op.drop_index('ix_member_name_lower', table_name='member')
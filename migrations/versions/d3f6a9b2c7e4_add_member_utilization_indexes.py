@@ -0,0 +1,30 @@
+"""add member utilization indexes
+
+Revision ID: d3f6a9b2c7e4
+Revises: b5e8c2d4f9a1
+Create Date: 2026-10-18 19:52:31.208417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f6a9b2c7e4'
+down_revision = 'b5e8c2d4f9a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('member', schema=None) as batch_op:
+        batch_op.create_index('ix_member_membership_plan_id_membership_status', ['membership_plan_id', 'membership_status'], unique=False)
+        batch_op.create_index('ix_member_trainer_id_membership_status', ['trainer_id', 'membership_status'], unique=False)
+        batch_op.create_index('ix_member_workout_plan_id_membership_status', ['workout_plan_id', 'membership_status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('member', schema=None) as batch_op:
+        batch_op.drop_index('ix_member_workout_plan_id_membership_status')
+        batch_op.drop_index('ix_member_trainer_id_membership_status')
+        batch_op.drop_index('ix_member_membership_plan_id_membership_status')
@@ -0,0 +1,28 @@
+"""add goal chart indexes
+
+Revision ID: e8b1d4c6f2a9
+Revises: d3f6a9b2c7e4
+Create Date: 2026-10-18 20:41:06.775193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b1d4c6f2a9'
+down_revision = 'd3f6a9b2c7e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.create_index('ix_goal_goal_type_target_value_current_value', ['goal_type', 'target_value', 'current_value'], unique=False)
+        batch_op.create_index('ix_goal_user_id_goal_type', ['user_id', 'goal_type'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.drop_index('ix_goal_user_id_goal_type')
+        batch_op.drop_index('ix_goal_goal_type_target_value_current_value')